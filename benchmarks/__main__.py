@@ -0,0 +1,96 @@
+"""
+Offline benchmarks for the Infrastructure Builder. AWS APIs are stubbed with botocore's Stubber, so no AWS account is
+needed.
+
+Usage: python -m benchmarks [--quick] [--compare VERSION] [benchmark ...]
+
+Results are stored in benchmarks/results/<version>.json; pass --compare to compare them with the results of another
+version.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+from importlib import metadata
+
+from benchmarks import bench_aws, bench_registry
+from infrastructure_builder import tracing
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def all_benchmarks() -> dict:
+    return {name.removeprefix("bench_"): func
+            for module in [bench_registry, bench_aws]
+            for name, func in vars(module).items()
+            if name.startswith("bench_") and callable(func)}
+
+
+def current_version() -> str:
+    try:
+        return metadata.version("infrastructure-builder")
+    except metadata.PackageNotFoundError:
+        return "dev"
+
+
+def format_results(results: dict, baseline: dict = None) -> str:
+    rows = [("Benchmark", "Metric", "Value", "Baseline", "Change")]
+    for benchmark, metrics in results.items():
+        for metric, value in metrics.items():
+            baseline_value = (baseline or {}).get(benchmark, {}).get(metric)
+            change = f"{(value - baseline_value) / baseline_value:+.1%}" if baseline_value else ""
+            rows.append((benchmark, metric, f"{value:.3f}",
+                         "" if baseline_value is None else f"{baseline_value:.3f}", change))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(f"{row[0]: <{widths[0]}}  {row[1]: <{widths[1]}}  " +
+                     "  ".join(f"{value: >{width}}" for value, width in zip(row[2:], widths[2:]))
+                     for row in rows)
+
+
+def main():
+    benchmarks = all_benchmarks()
+    parser = argparse.ArgumentParser(description="Run benchmarks",
+                                     epilog="Benchmarks:\n" + "\n".join(benchmarks),
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("benchmarks", metavar="benchmark", nargs="*", help="Benchmark to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="Use smaller data sets")
+    parser.add_argument("--version", default=current_version(),
+                        help="Version to store the results for (default: installed version)")
+    parser.add_argument("--compare", metavar="VERSION", help="Compare results with results of this version")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = {}
+    for name in args.benchmarks or benchmarks:
+        if name not in benchmarks:
+            parser.error(f"Unknown benchmark {name}")
+        print(f"Running {name}...", file=sys.stderr)
+        tracing.set_tracer(tracing.Tracer())
+        try:
+            results[name] = benchmarks[name](args.quick)
+        finally:
+            tracing.set_tracer(None)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)["results"]
+    print(format_results(results, baseline))
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        filename = os.path.join(RESULTS_DIR, f"{args.version}.json")
+        with open(filename, "w") as f:
+            json.dump(dict(version=args.version, quick=args.quick, python=platform.python_version(),
+                           platform=platform.platform(), timestamp=datetime.now(timezone.utc).isoformat(),
+                           results=results), f, indent=2)
+        print(f"Results written to {filename}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
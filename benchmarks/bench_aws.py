@@ -0,0 +1,139 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import boto3
+from botocore.stub import Stubber
+
+from infrastructure_builder import tracing
+from infrastructure_builder.aws.cloudformation import CloudFormation
+from infrastructure_builder.aws.service_base import ServiceBase
+
+
+def _session() -> boto3.Session:
+    return boto3.Session(region_name="eu-central-1", aws_access_key_id="benchmark",
+                         aws_secret_access_key="benchmark")
+
+
+def _stub(helper: ServiceBase, *service_names: str) -> dict[str, Stubber]:
+    """
+    Creates a stubbed client for each service and makes the helper use these clients.
+    """
+    clients = {service_name: ServiceBase.create_client(helper, service_name) for service_name in service_names}
+    helper.create_client = lambda service_name, region_name=None: clients[service_name]
+    stubbers = {service_name: Stubber(client) for service_name, client in clients.items()}
+    for stubber in stubbers.values():
+        stubber.activate()
+    return stubbers
+
+
+def _measure(func) -> dict:
+    """
+    Executes a function with tracing enabled and returns its duration and the number of API calls.
+    """
+    tracer = tracing.get_tracer()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    api_calls = sum(1 for span in tracer.spans if span.category == "aws")
+    return dict(seconds=elapsed, api_calls=api_calls)
+
+
+def _stack(status: str, stack_id: str = "arn:aws:cloudformation:eu-central-1:123456789012:stack/benchmark/1") -> dict:
+    return dict(StackId=stack_id, StackName="benchmark", CreationTime=datetime.now(timezone.utc), StackStatus=status)
+
+
+def _stack_event(i: int) -> dict:
+    return dict(StackId="benchmark", EventId=f"event-{i}", StackName="benchmark", Timestamp=datetime.now(timezone.utc),
+                ResourceStatus="CREATE_IN_PROGRESS", ResourceType="AWS::S3::Bucket", LogicalResourceId=f"Bucket{i}")
+
+
+def bench_cloudformation_wait(quick: bool) -> dict:
+    """
+    Waiting for a stack which is in progress for a number of polls.
+    """
+    polls = 20 if quick else 100
+    cloudformation = CloudFormation(_session(), time_between_checks=0)
+    stubber = _stub(cloudformation, "cloudformation")["cloudformation"]
+    events = []
+    for i in range(polls):
+        events = [_stack_event(i)] + events[:99]
+        stubber.add_response("describe_stacks", dict(Stacks=[_stack("CREATE_IN_PROGRESS")]))
+        stubber.add_response("describe_stack_events", dict(StackEvents=events))
+    stubber.add_response("describe_stacks", dict(Stacks=[_stack("CREATE_COMPLETE")]))
+    stubber.add_response("describe_stack_events", dict(StackEvents=events))
+
+    result = _measure(lambda: cloudformation._wait_until_completed("benchmark"))
+    result["api_calls_per_poll"] = result["api_calls"] / (polls + 1)
+    result["ms_per_poll"] = result["seconds"] / (polls + 1) * 1000
+    return result
+
+
+def bench_stack_deploy_fan_out(quick: bool) -> dict:
+    """
+    Creating a number of stacks one after another.
+    """
+    stacks = 10 if quick else 50
+    cloudformation = CloudFormation(_session(), time_between_checks=0)
+    stubber = _stub(cloudformation, "cloudformation")["cloudformation"]
+    for i in range(stacks):
+        stack_id = f"arn:aws:cloudformation:eu-central-1:123456789012:stack/benchmark{i}/1"
+        stubber.add_client_error("describe_stacks", "ValidationError", "Stack does not exist", 400)
+        stubber.add_response("create_stack", dict(StackId=stack_id))
+        stubber.add_response("describe_stacks", dict(Stacks=[_stack("CREATE_COMPLETE", stack_id)]))
+        stubber.add_response("describe_stack_events", dict(StackEvents=[]))
+
+    fd, template_filename = tempfile.mkstemp(suffix=".yaml")
+    with os.fdopen(fd, "w") as f:
+        f.write("Resources: {}\n")
+    try:
+        result = _measure(lambda: [cloudformation.create_or_update_stack(f"benchmark{i}", template_filename)
+                                   for i in range(stacks)])
+    finally:
+        os.remove(template_filename)
+    result["ms_per_stack"] = result["seconds"] / stacks * 1000
+    return result
+
+
+def bench_empty_s3_bucket(quick: bool) -> dict:
+    """
+    Deleting all objects of a versioned S3 bucket.
+    """
+    objects = 10_000 if quick else 100_000
+    cloudformation = CloudFormation(_session())
+    stubber = _stub(cloudformation, "s3")["s3"]
+    for page_start in range(0, objects, 1000):
+        page_end = min(page_start + 1000, objects)
+        page = dict(Versions=[dict(Key=f"key{i}", VersionId=f"v{i}") for i in range(page_start, page_end)],
+                    IsTruncated=page_end < objects)
+        if page_end < objects:
+            page.update(NextKeyMarker=f"key{page_end - 1}", NextVersionIdMarker=f"v{page_end - 1}")
+        stubber.add_response("list_object_versions", page)
+        stubber.add_response("delete_objects", dict(Deleted=[]))
+
+    result = _measure(lambda: cloudformation._empty_s3_bucket("benchmark"))
+    result["objects"] = objects
+    result["us_per_object"] = result["seconds"] / objects * 1_000_000
+    return result
+
+
+def bench_empty_ecr_repository(quick: bool) -> dict:
+    """
+    Deleting all images of an ECR repository.
+    """
+    images = 10_000 if quick else 100_000
+    cloudformation = CloudFormation(_session())
+    stubber = _stub(cloudformation, "ecr")["ecr"]
+    for page_start in range(0, images, 100):
+        page_end = min(page_start + 100, images)
+        page = dict(imageIds=[dict(imageDigest=f"sha256:{i:064x}") for i in range(page_start, page_end)])
+        if page_end < images:
+            page["nextToken"] = f"token{page_end}"
+        stubber.add_response("list_images", page)
+        stubber.add_response("batch_delete_image", dict(imageIds=page["imageIds"], failures=[]))
+
+    result = _measure(lambda: cloudformation._empty_ecr_repository("benchmark"))
+    result["images"] = images
+    result["us_per_image"] = result["seconds"] / images * 1_000_000
+    return result
@@ -0,0 +1,73 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import infrastructure_builder
+from infrastructure_builder.task_registry import TaskRegistry
+
+
+SERVICES = [f"Service{i:03d}" for i in range(200)]
+ENVIRONMENTS = ["Dev", "Test", "Prod"]
+REGIONS = ["EuCentral1", "EuWest1", "UsEast1", "UsWest2", "ApSoutheast1", "ApNortheast1", "SaEast1", "CaCentral1"]
+
+
+def _time_per_call(func, args: list, repeat: int = 3) -> float:
+    """
+    Returns the best time of several runs in microseconds per call.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for arg in args:
+            func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(args) * 1_000_000
+
+
+def bench_get_task(quick: bool) -> dict:
+    """
+    Task lookup in a registry with one task per service, environment and region.
+    """
+    class Registry(TaskRegistry):
+        tasks = {}
+
+    for service in SERVICES:
+        for environment in ENVIRONMENTS:
+            for region in REGIONS:
+                Registry.task(f"deploy{service}{environment}{region}", description=f"Deploy {service}")(lambda: None)
+
+    names = list(Registry.tasks)[::10 if quick else 1]
+    return dict(
+        tasks=len(Registry.tasks),
+        exact_us=_time_per_call(Registry.get_task, names),
+        case_insensitive_us=_time_per_call(Registry.get_task, [name.lower() for name in names[:100]]),
+        prefix_us=_time_per_call(Registry.get_task, [name[:-1] for name in names[:100]]),
+        ambiguous_us=_time_per_call(Registry.get_task, ["deployservice0"] * 100),
+        format_descriptions_us=_time_per_call(lambda _: Registry.format_task_descriptions(), [None] * 10),
+    )
+
+
+def _startup_time(statement: str, repeat: int) -> float:
+    src_dir = os.path.dirname(os.path.dirname(infrastructure_builder.__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([src_dir, os.environ.get("PYTHONPATH", "")]))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True, env=env)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def bench_cli_startup(quick: bool) -> dict:
+    """
+    Time to start a Python interpreter and import the task registry, or the AWS helpers.
+    """
+    repeat = 3 if quick else 10
+    return dict(
+        python_ms=_startup_time("pass", repeat),
+        task_registry_ms=_startup_time("import infrastructure_builder.task_registry", repeat),
+        aws_helpers_ms=_startup_time("import infrastructure_builder.aws.cloudformation", repeat),
+    )
@@ -6,6 +6,8 @@ from time import sleep
 
 import boto3
 
+from infrastructure_builder import tracing
+from infrastructure_builder.aws.logs import CloudWatchLogs
 from infrastructure_builder.aws.service_base import ServiceBase
 from infrastructure_builder.exceptions import BuilderError
 
@@ -26,13 +28,13 @@ class Batch(ServiceBase):
         Returns a Boto3 client for AWS Batch. The client object is cached.
         :return: A Boto3 client for AWS Batch
         """
-        return self.session.client("batch", region_name=self.region)
+        return self.create_client("batch")
 
     def submit_job(self, job_name: str, job_queue: str, job_definition: str, timeout: int = 15,
-                   wait_until_completed: bool = True) -> str:
+                   wait_until_completed: bool = True, tail_logs: bool = False) -> str:
         """
-        Submits an AWS Batch Job. If this functions waits until the job has been completed, any updates will be logged
-        via standard Python logging module with info level.
+        Submits an AWS Batch Job. If this functions waits until the job has been completed, any updates and the job's
+        log output will be logged via standard Python logging module with info level.
 
         :param job_name: The name of the job.
         :param job_queue: The queue where the job will be put into.
@@ -41,6 +43,8 @@ class Batch(ServiceBase):
             BuilderError exception will be raised. The job will continue to run, it will not be aborted!
         :param wait_until_completed: If False, this method will return immediately after submit, else will wait until
             the job has finished or the timeout has been reached.
+        :param tail_logs: If True, the job's CloudWatch log stream will be logged while waiting; this requires the
+            permission logs:GetLogEvents.
         :return: Job ID
         """
         submitted_job = self.client.submit_job(jobName=job_name, jobQueue=job_queue, jobDefinition=job_definition)
@@ -49,22 +53,7 @@ class Batch(ServiceBase):
             return job_id
 
         logger.info(f"Job {job_id} submitted, now waiting until completed.")
-        last_job_status = None
-        start = datetime.now(timezone.utc) - timedelta(seconds=30)
-        end = start + timedelta(minutes=timeout)
-        while True:
-            if datetime.now(timezone.utc) > end:
-                raise BuilderError("Timeout")
-
-            job_description = self.client.describe_jobs(jobs=[job_id])["jobs"][0]
-            job_status = job_description["status"]
-            if job_status != last_job_status:
-                last_job_status = job_status
-                logger.info(f"Job status: {job_status}")
-            if job_status in ["SUCCEEDED", "FAILED"]:
-                break
-
-            sleep(5)
+        job_description = self.wait_for_jobs([job_id], timeout, tail_logs)[0]
 
         logger.info(f"Job status reason: {job_description['statusReason']}")
 
@@ -74,3 +63,66 @@ class Batch(ServiceBase):
         logger.info(f"Job details in AWS console: {url}")
 
         return job_id
+
+    def wait_for_jobs(self, job_ids: list[str], timeout: int = 15, tail_logs: bool = True) -> list[dict]:
+        """
+        Waits until AWS Batch Jobs have been completed. Any status changes will be logged via standard Python logging
+        module with info level. If tail_logs is True, the log stream of each job will be followed, i.e. each new line
+        will be logged as soon as the job has written it to CloudWatch (this requires the permission logs:GetLogEvents;
+        without it, a warning is logged and the jobs are waited for anyway). If there are several jobs, each message is
+        prefixed with the job name.
+
+        :param job_ids: The IDs of the jobs.
+        :param timeout: The maximum time to wait for the jobs to finish (in minutes). If the jobs take more time, an
+            BuilderError exception will be raised. The jobs will continue to run, they will not be aborted!
+        :param tail_logs: If True, the jobs' CloudWatch log streams will be logged while waiting.
+        :return: List with the description of each job, in the same order as the job IDs
+        """
+        logs = CloudWatchLogs(self.session, self.region)
+        last_job_status = {}
+        tailers = {}
+        job_descriptions = {}
+        start = datetime.now(timezone.utc) - timedelta(seconds=30)
+        end = start + timedelta(minutes=timeout)
+
+        def log_prefix(job_description: dict) -> str:
+            return f"[{job_description['jobName']}] " if len(job_ids) > 1 else ""
+
+        def tail(job_description: dict) -> None:
+            job_id = job_description["jobId"]
+            if job_id not in tailers:
+                container = job_description.get("container", {})
+                if "logStreamName" not in container:
+                    return
+                log_group = container.get("logConfiguration", {}).get("options", {}).get("awslogs-group",
+                                                                                         "/aws/batch/job")
+                tailers[job_id] = logs.tail(log_group, container["logStreamName"])
+            for event in tailers[job_id].poll():
+                logger.info(f"{log_prefix(job_description)}{event['message']}")
+
+        with tracing.span("batch.wait", "wait", jobs=len(job_ids)):
+            while True:
+                if datetime.now(timezone.utc) > end:
+                    raise BuilderError("Timeout")
+
+                running_job_ids = [job_id for job_id in job_ids
+                                   if last_job_status.get(job_id) not in ["SUCCEEDED", "FAILED"]]
+                # describe_jobs accepts up to 100 jobs per call
+                for i in range(0, len(running_job_ids), 100):
+                    for job_description in self.client.describe_jobs(jobs=running_job_ids[i:i + 100])["jobs"]:
+                        job_id = job_description["jobId"]
+                        job_descriptions[job_id] = job_description
+                        job_status = job_description["status"]
+                        if job_status != last_job_status.get(job_id):
+                            last_job_status[job_id] = job_status
+                            logger.info(f"{log_prefix(job_description)}Job status: {job_status}")
+                        if tail_logs:
+                            # Also done when the job has just finished, to get its last lines
+                            tail(job_description)
+
+                if all(last_job_status.get(job_id) in ["SUCCEEDED", "FAILED"] for job_id in job_ids):
+                    break
+
+                sleep(5)
+
+        return [job_descriptions[job_id] for job_id in job_ids]
@@ -8,6 +8,7 @@ from typing import Optional
 import boto3
 from botocore.exceptions import ClientError
 
+from infrastructure_builder import tracing
 from infrastructure_builder.aws.service_base import ServiceBase
 from infrastructure_builder.exceptions import BuilderError
 
@@ -77,7 +78,7 @@ class CloudFormation(ServiceBase):
         Returns a Boto3 client for AWS CloudFormation. The client object is cached.
         :return: A Boto3 client for AWS CloudFormation
         """
-        return self.session.client("cloudformation", region_name=self.region)
+        return self.create_client("cloudformation")
 
     def _describe_stack(self, stack_name: str):
         try:
@@ -114,38 +115,40 @@ class CloudFormation(ServiceBase):
 
     def _empty_ecr_repository(self, resource_id: str):
         logger.info(f'Deleting all images in {resource_id}')
-        ecr_client = self.session.client("ecr", region_name=self.region)
-        images = ecr_client.list_images(repositoryName=resource_id)
-        # The response contains the first 100 images only.
-        # In most cases, a repository contains a few images only, so this approach is fine.
-        image_digests = [image["imageDigest"] for image in images["imageIds"]]
-        if not image_digests:
-            return
-
-        resp = ecr_client.batch_delete_image(repositoryName=resource_id,
-                                             imageIds=[{"imageDigest": image_digest} for image_digest in image_digests])
-        failures = resp["failures"]
-        if failures:
-            raise BuilderError(f'Cannot empty ECR {resource_id} ({failures})')
+        ecr_client = self.create_client("ecr")
+        paginator = ecr_client.get_paginator("list_images")
+        for response_page in paginator.paginate(repositoryName=resource_id):
+            # A page contains up to 100 images, which is also the limit of batch_delete_image
+            image_digests = {image["imageDigest"] for image in response_page["imageIds"]}
+            if not image_digests:
+                continue
+
+            resp = ecr_client.batch_delete_image(repositoryName=resource_id,
+                                                 imageIds=[{"imageDigest": image_digest}
+                                                           for image_digest in image_digests])
+            # An image with several tags may be listed on several pages, so it might have been deleted already
+            failures = [failure for failure in resp["failures"] if failure.get("failureCode") != "ImageNotFound"]
+            if failures:
+                raise BuilderError(f'Cannot empty ECR {resource_id} ({failures})')
 
     def _empty_s3_bucket(self, resource_id: str):
         logger.info(f'Deleting all files in {resource_id}')
-        s3_client = self.session.client("s3", region_name=self.region)
-        resp = s3_client.list_object_versions(Bucket=resource_id)
-        # The response contains the first 1000 images only.
-        # In most cases, a bucket contains a few files only, so this approach is fine.
-        objects_to_delete = [{"Key": version["Key"], "VersionId": version["VersionId"]}
-                             for version in resp.get("Versions", [])]
-        if not objects_to_delete:
-            return
-
-        resp = s3_client.delete_objects(Bucket=resource_id, Delete={
-            "Objects": objects_to_delete,
-            "Quiet": True
-        })
-        errors = resp.get("Errors", [])
-        if errors:
-            raise BuilderError(f'Cannot empty S3 bucket {resource_id} ({errors})')
+        s3_client = self.create_client("s3")
+        paginator = s3_client.get_paginator("list_object_versions")
+        for response_page in paginator.paginate(Bucket=resource_id):
+            # A page contains up to 1000 versions, which is also the limit of delete_objects
+            objects_to_delete = [{"Key": version["Key"], "VersionId": version["VersionId"]}
+                                 for version in response_page.get("Versions", [])]
+            if not objects_to_delete:
+                continue
+
+            resp = s3_client.delete_objects(Bucket=resource_id, Delete={
+                "Objects": objects_to_delete,
+                "Quiet": True
+            })
+            errors = resp.get("Errors", [])
+            if errors:
+                raise BuilderError(f'Cannot empty S3 bucket {resource_id} ({errors})')
 
     def delete_stack(self, stack_name: str, delete_content: bool = False) -> None:
         """
@@ -189,27 +192,28 @@ class CloudFormation(ServiceBase):
                              f'{event["LogicalResourceId"]} {event.get("ResourceStatusReason", "")}'))
                 processed_events.add(event["EventId"])
 
-        while True:
-            if datetime.now(timezone.utc) > end:
-                raise BuilderError("Timeout")
+        with tracing.span("cloudformation.wait", "wait", stack=stack_id):
+            while True:
+                if datetime.now(timezone.utc) > end:
+                    raise BuilderError("Timeout")
 
-            stack = self._describe_stack(stack_id)
-            stack_status = stack["StackStatus"]
+                stack = self._describe_stack(stack_id)
+                stack_status = stack["StackStatus"]
 
-            events = self.client.describe_stack_events(StackName=stack_id)
-            print_events(events["StackEvents"])
+                events = self.client.describe_stack_events(StackName=stack_id)
+                print_events(events["StackEvents"])
 
-            if stack_status in self.COMPLETED_STATES:
-                break
-            elif stack_status in self.IN_PROGRESS_STATES:
-                # Continue loop
-                pass
-            elif stack_status in self.FAILED_STATES:
-                raise BuilderError(f'Stack {stack["StackName"]} failed: {stack["StackStatus"]}')
-            else:
-                raise BuilderError(f'Stack {stack["StackName"]} entered unknown state: {stack["StackStatus"]}')
+                if stack_status in self.COMPLETED_STATES:
+                    break
+                elif stack_status in self.IN_PROGRESS_STATES:
+                    # Continue loop
+                    pass
+                elif stack_status in self.FAILED_STATES:
+                    raise BuilderError(f'Stack {stack["StackName"]} failed: {stack["StackStatus"]}')
+                else:
+                    raise BuilderError(f'Stack {stack["StackName"]} entered unknown state: {stack["StackStatus"]}')
 
-            sleep(self._time_between_checks)
+                sleep(self._time_between_checks)
 
         return self._stack_outputs_to_stack(stack)
 
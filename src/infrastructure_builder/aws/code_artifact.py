@@ -18,7 +18,7 @@ class CodeArtifact(ServiceBase):
         Returns a Boto3 client for AWS CodeArtifact. The client object is cached.
         :return: A Boto3 client for AWS CodeArtifact
         """
-        return self.session.client("codeartifact", region_name=self.region)
+        return self.create_client("codeartifact")
 
     def get_authorization_token_pypi(self, domain: str, domain_owner: str, repository: str) -> dict:
         """
@@ -18,7 +18,7 @@ class Cognito(ServiceBase):
         Returns a Boto3 client for Amazon Cognito. The client object is cached.
         :return: A Boto3 client for Amazon Cognito
         """
-        return self.session.client("cognito-idp", region_name=self.region)
+        return self.create_client("cognito-idp")
 
     def get_user_pool_domain(self, domain: str) -> dict:
         """
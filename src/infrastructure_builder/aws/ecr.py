@@ -1,10 +1,51 @@
 import base64
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from functools import cached_property
+from typing import Optional
 from urllib.parse import urlparse
 
 import boto3
 
+from infrastructure_builder.aws.lambda_function import LambdaFunction
 from infrastructure_builder.aws.service_base import ServiceBase
+from infrastructure_builder.exceptions import BuilderError
+from infrastructure_builder.execute import execute, execute_live, execute_parallel
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_MEDIA_TYPES = [
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.oci.image.index.v1+json",
+]
+INDEX_MEDIA_TYPES = [
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+]
+
+
+@dataclass
+class DockerImage:
+    repository_name: str
+    tags: list[str]
+    context: str = "."
+    dockerfile: str = None
+    build_args: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class RemoteImage:
+    tag: str
+    image_digest: str
+    config_digest: Optional[str]
+    manifest: str
+    manifest_media_type: str
 
 
 class ElasticContainerRegistry(ServiceBase):
@@ -20,7 +61,7 @@ class ElasticContainerRegistry(ServiceBase):
         Returns a Boto3 client for Amazon Elastic Container Registry. The client object is cached.
         :return: A Boto3 client for Amazon Elastic Container Registry
         """
-        return self.session.client("ecr", region_name=self.region)
+        return self.create_client("ecr")
 
     @cached_property
     def public_client(self):
@@ -28,7 +69,7 @@ class ElasticContainerRegistry(ServiceBase):
         Returns a Boto3 client for Amazon ECR Public. The client object is cached.
         :return: A Boto3 client for Amazon ECR Public
         """
-        return self.session.client("ecr-public", region_name="us-east-1")
+        return self.create_client("ecr-public", region_name="us-east-1")
 
     def get_authorization_token(self) -> dict:
         """
@@ -61,3 +102,228 @@ class ElasticContainerRegistry(ServiceBase):
         auth_data = resp["authorizationData"]
         auth_token = base64.b64decode(auth_data["authorizationToken"]).decode("utf-8").split(":")
         return dict(user=auth_token[0], password=auth_token[1])
+
+    def docker_login(self) -> str:
+        """
+        Logs in the Docker client to the private registry.
+
+        :return: The registry hostname
+        """
+        auth = self.get_authorization_token()
+        execute_live(["docker", "login", "--username", auth["user"], "--password-stdin", auth["hostname"]],
+                     inp=auth["password"])
+        return auth["hostname"]
+
+    def get_remote_images(self, repository_name: str, tags: list[str]) -> dict[str, RemoteImage]:
+        """
+        Fetches the manifests of the given tags of a repository. Tags which do not exist are missing in the result.
+
+        :param repository_name: The name of the repository.
+        :param tags: The image tags to look up.
+        :return: Dictionary with tag as key and its remote image as value
+        """
+        remote_images = {}
+        # batch_get_image accepts up to 100 image IDs per call
+        for i in range(0, len(tags), 100):
+            resp = self.client.batch_get_image(repositoryName=repository_name,
+                                               imageIds=[{"imageTag": tag} for tag in tags[i:i + 100]],
+                                               acceptedMediaTypes=MANIFEST_MEDIA_TYPES)
+            for image in resp["images"]:
+                manifest = image["imageManifest"]
+                config = json.loads(manifest).get("config", {})
+                tag = image["imageId"]["imageTag"]
+                remote_images[tag] = RemoteImage(tag, image["imageId"]["imageDigest"], config.get("digest"),
+                                                 manifest, image.get("imageManifestMediaType"))
+        return remote_images
+
+    def put_image_tag(self, repository_name: str, remote_image: RemoteImage, tag: str) -> None:
+        """
+        Adds a tag to an image which is already stored in the repository, without pushing it again.
+
+        :param repository_name: The name of the repository.
+        :param remote_image: The image to tag.
+        :param tag: The new tag.
+        """
+        args = dict(repositoryName=repository_name, imageManifest=remote_image.manifest, imageTag=tag)
+        if remote_image.manifest_media_type:
+            args["imageManifestMediaType"] = remote_image.manifest_media_type
+        try:
+            self.client.put_image(**args)
+        except self.client.exceptions.ImageAlreadyExistsException:
+            pass
+
+    def build_and_push_images(self, images: list[DockerImage], max_parallel: int = 4) -> dict[str, str]:
+        """
+        Builds Docker images and pushes them to their repositories in the private registry. Images are built and pushed
+        concurrently.
+
+        Before pushing, the digest of each local image is compared with the images which are already stored under the
+        image's tags. If one of them is identical, nothing is pushed; missing or outdated tags are just moved to the
+        existing image.
+
+        The result is a dictionary with image reference as key and one of these values:
+
+        pushed: The image has been pushed
+        tagged: The tag has been added to an image which is stored in the repository already
+        unchanged: The image existed already with this tag
+
+        :param images: The images to build.
+        :param max_parallel: The maximum number of builds and pushes running at the same time.
+        :return: Dictionary with the action taken for each image tag
+        """
+        hostname = self.docker_login()
+
+        def local_ref(image: DockerImage, tag: str) -> str:
+            return f"{hostname}/{image.repository_name}:{tag}"
+
+        builds = {}
+        for image in images:
+            command = ["docker", "build"]
+            for tag in image.tags:
+                command += ["--tag", local_ref(image, tag)]
+            if image.dockerfile is not None:
+                command += ["--file", image.dockerfile]
+            for key, value in image.build_args.items():
+                command += ["--build-arg", f"{key}={value}"]
+            builds[f"{image.repository_name}:{image.tags[0]}"] = command + [image.context]
+        execute_parallel(builds, max_parallel=max_parallel)
+
+        result = {}
+        pushes = {}
+        for image in images:
+            # Depending on the image store, the local image ID is either the config digest or the manifest digest
+            local_id = execute(["docker", "image", "inspect", "--format", "{{.Id}}",
+                                local_ref(image, image.tags[0])]).stdout.strip()
+            remote_images = self.get_remote_images(image.repository_name, image.tags)
+            existing_image = next((remote_image for remote_image in remote_images.values()
+                                   if local_id in (remote_image.config_digest, remote_image.image_digest)), None)
+            if existing_image is None:
+                # Push one tag only, the layers of the other tags would be identical
+                ref = f"{image.repository_name}:{image.tags[0]}"
+                pushes[ref] = ["docker", "push", local_ref(image, image.tags[0])]
+                result[ref] = "pushed"
+                continue
+
+            for tag in image.tags:
+                ref = f"{image.repository_name}:{tag}"
+                if tag in remote_images and remote_images[tag].image_digest == existing_image.image_digest:
+                    result[ref] = "unchanged"
+                else:
+                    logger.info(f"Image {ref} exists already, adding tag only")
+                    self.put_image_tag(image.repository_name, existing_image, tag)
+                    result[ref] = "tagged"
+
+        if pushes:
+            execute_parallel(pushes, max_parallel=max_parallel)
+            for image in images:
+                if f"{image.repository_name}:{image.tags[0]}" not in pushes:
+                    continue
+                pushed_image = self.get_remote_images(image.repository_name, image.tags[:1])[image.tags[0]]
+                for tag in image.tags[1:]:
+                    self.put_image_tag(image.repository_name, pushed_image, tag)
+                    result[f"{image.repository_name}:{tag}"] = "tagged"
+        return result
+
+    def list_repositories(self, prefix: str = "") -> list[str]:
+        """
+        Returns the names of all repositories of the private registry, or of all repositories with the given prefix.
+
+        :param prefix: The prefix of the repository names, e.g. "project/".
+        :return: List of repository names
+        """
+        paginator = self.client.get_paginator("describe_repositories")
+        return [repository["repositoryName"]
+                for response_page in paginator.paginate()
+                for repository in response_page["repositories"]
+                if repository["repositoryName"].startswith(prefix)]
+
+    def delete_images(self, repository_name: str, image_digests: list[str]) -> None:
+        """
+        Deletes images including all their tags, up to 100 with each request. Images which do not exist are ignored.
+
+        :param repository_name: The name of the repository.
+        :param image_digests: The digests of the images.
+        """
+        for i in range(0, len(image_digests), 100):
+            resp = self.client.batch_delete_image(repositoryName=repository_name,
+                                                  imageIds=[{"imageDigest": image_digest}
+                                                            for image_digest in image_digests[i:i + 100]])
+            failures = [failure for failure in resp["failures"] if failure.get("failureCode") != "ImageNotFound"]
+            if failures:
+                raise BuilderError(f"Cannot delete images in {repository_name} ({failures})")
+
+    def prune_images(self, repository_prefix: str = "", keep_tagged: int = None,
+                     untagged_older_than: timedelta = None, protect_lambda_images: bool = True,
+                     dry_run: bool = False, max_parallel: int = 4) -> dict[str, list[str]]:
+        """
+        Deletes outdated images from all repositories (or all repositories with the given prefix). Repositories are
+        pruned concurrently. The following images are deleted:
+
+        - Tagged images, except the latest keep_tagged images (by push date) of each repository
+        - Untagged images which have been pushed before untagged_older_than
+
+        Images used by a Lambda Function of this region (if protect_lambda_images is True), and the images of a
+        multi-platform image which is kept, are never deleted.
+
+        :param repository_prefix: The prefix of the repository names, or an empty string for all repositories.
+        :param keep_tagged: The number of tagged images to keep in each repository, or None to keep all tagged images.
+        :param untagged_older_than: The minimum age of untagged images to delete, or None to keep all untagged images.
+        :param protect_lambda_images: If True, images used by a Lambda Function will not be deleted.
+        :param dry_run: If True, images are not deleted, but logged only.
+        :param max_parallel: The maximum number of repositories pruned at the same time.
+        :return: Dictionary with repository name as key and the digests of the deleted images as value
+        """
+        protected_digests = LambdaFunction(self.session, self.region).get_image_digests() \
+            if protect_lambda_images else set()
+        now = datetime.now(timezone.utc)
+
+        def prune(repository_name: str) -> list[str]:
+            paginator = self.client.get_paginator("describe_images")
+            images = [image
+                      for response_page in paginator.paginate(repositoryName=repository_name)
+                      for image in response_page["imageDetails"]]
+            tagged_images = sorted((image for image in images if image.get("imageTags")),
+                                   key=lambda image: image["imagePushedAt"], reverse=True)
+
+            candidates = []
+            if keep_tagged is not None:
+                candidates += tagged_images[keep_tagged:]
+            if untagged_older_than is not None:
+                candidates += [image for image in images if not image.get("imageTags") and
+                               image["imagePushedAt"] < now - untagged_older_than]
+            candidate_digests = {image["imageDigest"] for image in candidates}
+            kept_images = [image for image in images if image["imageDigest"] not in candidate_digests]
+
+            # The images of a multi-platform image (and its attestations) are untagged, but must be kept with it
+            indexes = [image["imageDigest"] for image in kept_images
+                       if image.get("imageManifestMediaType") in INDEX_MEDIA_TYPES]
+            referenced_digests = self._get_referenced_digests(repository_name, indexes)
+
+            image_digests = sorted(candidate_digests - protected_digests - referenced_digests)
+            for image in candidates:
+                if image["imageDigest"] in image_digests:
+                    logger.info(f"{'Would delete' if dry_run else 'Deleting'} image {repository_name}@"
+                                f"{image['imageDigest']} ({', '.join(image.get('imageTags', [])) or 'untagged'}, "
+                                f"pushed {image['imagePushedAt']:%Y-%m-%d})")
+            if not dry_run:
+                self.delete_images(repository_name, image_digests)
+            return image_digests
+
+        repository_names = self.list_repositories(repository_prefix)
+        if not repository_names:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            deleted_digests = dict(zip(repository_names, executor.map(prune, repository_names)))
+        return {name: digests for name, digests in deleted_digests.items() if digests}
+
+    def _get_referenced_digests(self, repository_name: str, index_digests: list[str]) -> set[str]:
+        referenced_digests = set()
+        for i in range(0, len(index_digests), 100):
+            resp = self.client.batch_get_image(repositoryName=repository_name,
+                                               imageIds=[{"imageDigest": image_digest}
+                                                         for image_digest in index_digests[i:i + 100]],
+                                               acceptedMediaTypes=MANIFEST_MEDIA_TYPES)
+            for image in resp["images"]:
+                manifests = json.loads(image["imageManifest"]).get("manifests", [])
+                referenced_digests.update(manifest["digest"] for manifest in manifests)
+        return referenced_digests
@@ -0,0 +1,98 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import boto3
+import botocore.session
+from botocore.credentials import AssumeRoleCredentialFetcher, DeferredRefreshableCredentials
+
+from infrastructure_builder.aws.service_base import use_session
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Target:
+    region: str
+    profile: Optional[str] = None
+    role_arn: Optional[str] = None
+
+    def __str__(self):
+        return "/".join(part for part in [self.profile, self.role_arn, self.region] if part)
+
+
+@dataclass
+class TargetResult:
+    target: Target
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(target: Target) -> boto3.Session:
+    """
+    Returns a session for a target. Sessions are pooled, i.e. each target gets the same session (and, therefore, the
+    same clients) on every call.
+
+    If the target has a role ARN, the role is assumed with the credentials of the profile (or the default credentials);
+    the temporary credentials are refreshed automatically before they expire.
+
+    :param target: The target
+    :return: The session
+    """
+    with _sessions_lock:
+        session = _sessions.get(target)
+        if session is None:
+            session = boto3.Session(profile_name=target.profile, region_name=target.region)
+            if target.role_arn is not None:
+                fetcher = AssumeRoleCredentialFetcher(
+                    client_creator=session._session.create_client,
+                    source_credentials=session.get_credentials(),
+                    role_arn=target.role_arn,
+                    extra_args=dict(RoleSessionName="infrastructure-builder"))
+                role_session = botocore.session.Session()
+                role_session._credentials = DeferredRefreshableCredentials(
+                    method="assume-role", refresh_using=fetcher.fetch_credentials)
+                session = boto3.Session(botocore_session=role_session, region_name=target.region)
+            _sessions[target] = session
+        return session
+
+
+def fan_out(func: Callable[[Target], Any], targets: list[Target], max_workers: int = None) -> list[TargetResult]:
+    """
+    Executes a function for several targets, i.e. accounts and regions, concurrently. While the function is running,
+    all helpers created without a session (e.g. CloudFormation()) use the target's session and region, so a task can
+    be executed unchanged for each target:
+
+    results = fan_out(lambda target: setup_something(), [Target("eu-west-1"), Target("us-east-1")])
+
+    Errors do not stop the other targets; the result of each target contains either the return value of the function,
+    or the exception.
+
+    :param func: The function to execute; it gets the target as parameter.
+    :param targets: The targets.
+    :param max_workers: The maximum number of targets processed at the same time, or None for all targets.
+    :return: List of results, in the same order as the targets
+    """
+    def run(target: Target) -> TargetResult:
+        try:
+            with use_session(get_session(target), target.region):
+                return TargetResult(target, result=func(target))
+        except Exception as err:
+            logger.error(f"{target}: {type(err).__name__}: {err}")
+            return TargetResult(target, error=err)
+
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets)) as executor:
+        return list(executor.map(run, targets))
@@ -1,9 +1,11 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
 from time import sleep
 
 import boto3
 
+from infrastructure_builder import tracing
 from infrastructure_builder.aws.service_base import ServiceBase
 
 
@@ -23,7 +25,7 @@ class LambdaFunction(ServiceBase):
         Returns a Boto3 client for AWS Lambda. The client object is cached.
         :return: A Boto3 client for AWS Lambda
         """
-        return self.session.client("lambda", region_name=self.region)
+        return self.create_client("lambda")
 
     def update_function_code(self, function_name: str, image_uri: str, alias: str = None,
                              provision: int = None) -> None:
@@ -48,15 +50,16 @@ class LambdaFunction(ServiceBase):
                                                                Qualifier=alias,
                                                                ProvisionedConcurrentExecutions=provision)
 
-            while True:
-                alias_config = self.client.get_alias(FunctionName=function_name, Name=alias)
-                if (alias_config["FunctionVersion"] == function_version or
-                        "RoutingConfig" not in alias_config or
-                        "AdditionalVersionWeights" not in alias_config["RoutingConfig"] or
-                        len(alias_config["RoutingConfig"]["AdditionalVersionWeights"]) == 0):
-                    break
-                logger.info("Waiting for new Lambda version becoming active")
-                sleep(3)
+            with tracing.span("lambda.wait", "wait", function=function_name, alias=alias):
+                while True:
+                    alias_config = self.client.get_alias(FunctionName=function_name, Name=alias)
+                    if (alias_config["FunctionVersion"] == function_version or
+                            "RoutingConfig" not in alias_config or
+                            "AdditionalVersionWeights" not in alias_config["RoutingConfig"] or
+                            len(alias_config["RoutingConfig"]["AdditionalVersionWeights"]) == 0):
+                        break
+                    logger.info("Waiting for new Lambda version becoming active")
+                    sleep(3)
 
     def delete_old_versions(self, function_name: str, keep_latest_versions: int = 5) -> list[str]:
         """
@@ -83,3 +86,31 @@ class LambdaFunction(ServiceBase):
             self.client.delete_function(FunctionName=function_name, Qualifier=outdated_version["Version"])
 
         return deleted_versions
+
+    def get_image_digests(self, max_parallel: int = 8) -> set[str]:
+        """
+        Returns the digests of all container images which are used by any Lambda Function in the region, including
+        all published versions.
+
+        :param max_parallel: The maximum number of requests running at the same time.
+        :return: Set of image digests, e.g. "sha256:..."
+        """
+        paginator = self.client.get_paginator("list_functions")
+        versions = [(function["FunctionName"], function["Version"])
+                    for response_page in paginator.paginate(FunctionVersion="ALL")
+                    for function in response_page["Functions"]
+                    if function.get("PackageType") == "Image"]
+
+        def get_image_uri(version: tuple[str, str]) -> str:
+            function_name, qualifier = version
+            try:
+                resp = self.client.get_function(FunctionName=function_name, Qualifier=qualifier)
+            except self.client.exceptions.ResourceNotFoundException:
+                # Deleted in the meantime
+                return ""
+            return resp["Code"].get("ResolvedImageUri", "")
+
+        # The image of a version is available by get_function only
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            image_uris = list(executor.map(get_image_uri, versions))
+        return {image_uri.partition("@")[2] for image_uri in image_uris if "@" in image_uri}
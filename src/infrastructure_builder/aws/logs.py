@@ -0,0 +1,89 @@
+import logging
+from functools import cached_property
+
+import boto3
+from botocore.exceptions import ClientError
+
+from infrastructure_builder.aws.service_base import ServiceBase
+
+
+logger = logging.getLogger(__name__)
+
+
+class LogStreamTailer:
+    """
+    Follows a CloudWatch log stream. Each poll fetches only the events which have been added since the last poll, using
+    the forward token of get_log_events.
+    """
+    log_group: str
+    log_stream: str
+
+    def __init__(self, client, log_group: str, log_stream: str):
+        """
+        Initializes a new tailer.
+
+        :param client: A Boto3 client for Amazon CloudWatch Logs
+        :param log_group: The name of the log group
+        :param log_stream: The name of the log stream
+        """
+        self._client = client
+        self.log_group = log_group
+        self.log_stream = log_stream
+        self._next_token = None
+        self._stopped = False
+
+    def poll(self) -> list[dict]:
+        """
+        Fetches all new events of the log stream. If the log stream does not exist yet, no events are returned. If the
+        log stream cannot be read, e.g. due to missing permissions, a warning is logged once, and the tailer stops.
+
+        :return: List of events, each a dictionary with keys timestamp, message, and ingestionTime
+        """
+        events = []
+        while not self._stopped:
+            args = dict(logGroupName=self.log_group, logStreamName=self.log_stream, startFromHead=True)
+            if self._next_token is not None:
+                args["nextToken"] = self._next_token
+            try:
+                resp = self._client.get_log_events(**args)
+            except self._client.exceptions.ResourceNotFoundException:
+                return events
+            except ClientError as err:
+                logger.warning(f"Cannot read log stream {self.log_group}/{self.log_stream}, stop following it: {err}")
+                self._stopped = True
+                return events
+
+            events.extend(resp["events"])
+            # At the end of the stream, the same token is returned again
+            next_token = resp["nextForwardToken"]
+            if next_token == self._next_token or not resp["events"]:
+                self._next_token = next_token
+                return events
+            self._next_token = next_token
+        return events
+
+
+class CloudWatchLogs(ServiceBase):
+    """
+    Helper functions for Amazon CloudWatch Logs
+    """
+    def __init__(self, session: boto3.Session = None, region: str = None):
+        super().__init__(session, region)
+
+    @cached_property
+    def client(self):
+        """
+        Returns a Boto3 client for Amazon CloudWatch Logs. The client object is cached.
+        :return: A Boto3 client for Amazon CloudWatch Logs
+        """
+        return self.create_client("logs")
+
+    def tail(self, log_group: str, log_stream: str) -> LogStreamTailer:
+        """
+        Returns a tailer which follows a log stream.
+
+        :param log_group: The name of the log group
+        :param log_stream: The name of the log stream
+        :return: The tailer
+        """
+        return LogStreamTailer(self.client, log_group, log_stream)
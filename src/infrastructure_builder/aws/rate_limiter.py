@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from infrastructure_builder.tracing import is_throttling_error
+
+
+class AdaptiveRateLimiter:
+    """
+    Client-side token bucket for the requests to an AWS API. It is shared by all clients of the same service and region
+    in the process, so parallel workloads run near the API limit without tripping it.
+
+    The limiter does not limit anything until the first request is throttled. Then the rate is reduced to a fraction of
+    the rate requests were sent with (multiplicative decrease); each successful request increases the rate again
+    (additive increase) until the next request is throttled.
+    """
+    min_rate: float
+    beta: float
+    increase: float
+
+    def __init__(self, min_rate: float = 0.5, beta: float = 0.7, increase: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initializes a new rate limiter.
+
+        :param min_rate: The minimum rate in requests per second.
+        :param beta: The factor the rate is multiplied with when a request has been throttled.
+        :param increase: The value the rate (in requests per second) grows per second of successful requests.
+        :param clock: A function which returns the current time in seconds.
+        :param sleep: A function which waits for the given number of seconds.
+        """
+        self.min_rate = min_rate
+        self.beta = beta
+        self.increase = increase
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._enabled = False
+        self._rate = 0.0
+        self._tokens = 0.0
+        self._last_refill = clock()
+        self._last_increase = clock()
+        self._sent = deque()
+
+    @property
+    def rate(self) -> float:
+        """
+        Returns the current rate in requests per second, or 0 if the rate is not limited.
+        :return: The rate
+        """
+        return self._rate if self._enabled else 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(max(1.0, self._rate), self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def _measured_rate(self, now: float) -> float:
+        # Number of requests sent within the last second
+        while self._sent and self._sent[0] <= now - 1:
+            self._sent.popleft()
+        return float(len(self._sent))
+
+    def acquire(self) -> None:
+        """
+        Waits until a request may be sent.
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._measured_rate(now)
+                if not self._enabled:
+                    self._sent.append(now)
+                    return
+                self._refill(now)
+                # Allow for rounding errors, otherwise the remaining wait time might be too short to make progress
+                if self._tokens >= 1 - 1e-9:
+                    self._tokens = max(0.0, self._tokens - 1)
+                    self._sent.append(now)
+                    return
+                wait_time = (1 - self._tokens) / self._rate
+            self._sleep(wait_time)
+
+    def on_throttle(self) -> None:
+        """
+        Reduces the rate after a request has been throttled.
+        """
+        with self._lock:
+            now = self._clock()
+            measured_rate = self._measured_rate(now)
+            self._rate = max(self.min_rate, (min(measured_rate, self._rate) if self._enabled else measured_rate)
+                             * self.beta)
+            if not self._enabled:
+                self._enabled = True
+                self._tokens = 0.0
+                self._last_refill = now
+            self._refill(now)
+            self._last_increase = now
+
+    def on_success(self) -> None:
+        """
+        Increases the rate after a request has been successful.
+        """
+        with self._lock:
+            if not self._enabled:
+                return
+            now = self._clock()
+            self._refill(now)
+            # Do not increase the rate far beyond the rate requests are actually sent with
+            max_rate = max(self._rate, 2 * self._measured_rate(now))
+            self._rate = min(max_rate, self._rate + self.increase * (now - self._last_increase))
+            self._last_increase = now
+
+    def attach(self, client) -> None:
+        """
+        Registers handlers for botocore events at a Boto3 client, so each request of the client (including retries)
+        waits for the limiter, and each response adjusts the rate.
+
+        :param client: The Boto3 client
+        """
+        service_event_name = client.meta.service_model.service_id.hyphenize()
+
+        def before_send(**kwargs):
+            self.acquire()
+
+        def needs_retry(response, **kwargs):
+            if is_throttling_error(response):
+                self.on_throttle()
+            elif response is not None:
+                self.on_success()
+
+        client.meta.events.register(f"before-send.{service_event_name}", before_send)
+        # The retry handler stops the event chain if a request has to be retried, so this handler must come first
+        client.meta.events.register_first(f"needs-retry.{service_event_name}", needs_retry)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(service_name: str, region_name: str) -> AdaptiveRateLimiter:
+    """
+    Returns the rate limiter which is shared by all clients of a service in a region.
+
+    :param service_name: The name of the AWS service, e.g. "cloudformation"
+    :param region_name: The region
+    :return: The rate limiter
+    """
+    with _rate_limiters_lock:
+        return _rate_limiters.setdefault((service_name, region_name), AdaptiveRateLimiter())
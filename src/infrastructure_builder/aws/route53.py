@@ -18,7 +18,7 @@ class Route53(ServiceBase):
         Returns a Boto3 client for Amazon Route 53. The client object is cached.
         :return: A Boto3 client for Amazon Route 53
         """
-        return self.session.client("route53", region_name=self.region)
+        return self.create_client("route53")
 
     def list_hosted_zones(self) -> list:
         """
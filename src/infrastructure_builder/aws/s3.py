@@ -0,0 +1,186 @@
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+
+from infrastructure_builder.aws.service_base import ServiceBase
+from infrastructure_builder.exceptions import BuilderError
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_KEY = ".sync-manifest.json"
+
+
+def file_hash(filename: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Calculates the SHA-256 hash of a file without reading it into memory at once.
+
+    :param filename: The filename
+    :param chunk_size: The number of bytes to read at once
+    :return: The hash as hex string
+    """
+    sha256 = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class SimpleStorageService(ServiceBase):
+    """
+    Helper functions for Amazon S3
+    """
+    def __init__(self, session: boto3.Session = None, region: str = None):
+        super().__init__(session, region)
+
+    @cached_property
+    def client(self):
+        """
+        Returns a Boto3 client for Amazon S3. The client object is cached.
+        :return: A Boto3 client for Amazon S3
+        """
+        return self.create_client("s3")
+
+    def sync_directory(self, directory: str, bucket: str, prefix: str = "", delete: bool = False,
+                       manifest_file: str = None, max_concurrency: int = 10,
+                       multipart_threshold: int = 8 * 1024 * 1024) -> dict[str, str]:
+        """
+        Uploads all files of a local directory to a bucket, e.g. Lambda packages, static web sites or CloudFormation
+        artifacts. Files which have not changed since the last sync are not uploaded again.
+
+        The SHA-256 hash of each uploaded file is stored in a manifest, either in a local file or, if manifest_file is
+        None, in the bucket as {prefix}/.sync-manifest.json. Files whose hash matches the manifest are skipped. The
+        manifest is trusted, i.e. objects which have been changed by someone else will not be replaced, unless delete is
+        True: then all keys with the prefix are listed, missing objects are uploaded again, and objects without a local
+        file are deleted.
+
+        Files are uploaded concurrently; large files are uploaded in parts, which are uploaded concurrently, too.
+
+        :param directory: The local directory.
+        :param bucket: The name of the bucket.
+        :param prefix: The prefix of all keys, e.g. "site", or an empty string to sync to the root of the bucket.
+        :param delete: If True, objects with the prefix which do not have a local file will be deleted.
+        :param manifest_file: The filename of a local manifest, or None to store the manifest in the bucket.
+        :param max_concurrency: The maximum number of concurrent uploads (files or parts).
+        :param multipart_threshold: Files of this size (in bytes) or larger are uploaded in parts.
+        :return: Dictionary with key of each object and what has been done, i.e. "uploaded", "unchanged", or "deleted"
+        """
+        key_prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+        manifest_key = f"{key_prefix}{MANIFEST_KEY}"
+
+        # Relative path of each local file, using "/" as separator
+        local_files = {}
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                local_files[os.path.relpath(path, directory).replace(os.sep, "/")] = path
+        if manifest_file is None:
+            local_files.pop(MANIFEST_KEY, None)
+
+        # Hashing is done in chunks, which releases the GIL
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            hashes = dict(zip(local_files, executor.map(file_hash, local_files.values())))
+
+        manifest = self._read_manifest(bucket, key_prefix, manifest_key, manifest_file)
+        remote_keys = self._list_keys(bucket, key_prefix) if delete else None
+
+        result = {}
+        uploads = set()
+        for name, file_hash_value in hashes.items():
+            key = f"{key_prefix}{name}"
+            unchanged = manifest.get(name) == file_hash_value
+            if unchanged and (remote_keys is None or key in remote_keys):
+                result[key] = "unchanged"
+            else:
+                uploads.add(name)
+
+        new_manifest = {name: manifest[name] for name in hashes if name not in uploads and name in manifest}
+        errors = []
+        if uploads:
+            logger.info(f"Uploading {len(uploads)} of {len(hashes)} files to s3://{bucket}/{key_prefix}")
+            config = TransferConfig(max_concurrency=max_concurrency, multipart_threshold=multipart_threshold)
+            with create_transfer_manager(self.client, config) as manager:
+                futures = {}
+                for name in sorted(uploads):
+                    extra_args = {}
+                    content_type, _ = mimetypes.guess_type(name)
+                    if content_type is not None:
+                        extra_args["ContentType"] = content_type
+                    futures[name] = manager.upload(local_files[name], bucket, f"{key_prefix}{name}", extra_args)
+                for name, future in futures.items():
+                    try:
+                        future.result()
+                        new_manifest[name] = hashes[name]
+                        result[f"{key_prefix}{name}"] = "uploaded"
+                    except Exception as err:
+                        errors.append(f"{name} ({err})")
+
+        if delete:
+            stale_keys = sorted(remote_keys - {f"{key_prefix}{name}" for name in hashes} - {manifest_key})
+            if stale_keys:
+                logger.info(f"Deleting {len(stale_keys)} objects from s3://{bucket}/{key_prefix}")
+                self.delete_objects(bucket, stale_keys)
+                result.update({key: "deleted" for key in stale_keys})
+
+        # The manifest contains all files uploaded successfully, so a failed sync does not upload them again
+        if new_manifest != manifest:
+            self._write_manifest(bucket, key_prefix, manifest_key, manifest_file, new_manifest)
+        if errors:
+            raise BuilderError(f"Upload failed: {', '.join(errors)}")
+        return result
+
+    def delete_objects(self, bucket: str, keys: list[str]) -> None:
+        """
+        Deletes objects, up to 1000 with each request.
+
+        :param bucket: The name of the bucket.
+        :param keys: The keys of the objects.
+        """
+        for i in range(0, len(keys), 1000):
+            resp = self.client.delete_objects(Bucket=bucket, Delete={
+                "Objects": [{"Key": key} for key in keys[i:i + 1000]],
+                "Quiet": True
+            })
+            if resp.get("Errors"):
+                raise BuilderError(f"Deleting objects failed: "
+                                   f"{', '.join(error['Key'] + ' (' + error['Code'] + ')' for error in resp['Errors'])}")
+
+    def _list_keys(self, bucket: str, prefix: str) -> set[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        return {obj["Key"]
+                for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+                for obj in page.get("Contents", [])}
+
+    def _read_manifest(self, bucket: str, key_prefix: str, manifest_key: str, manifest_file: str) -> dict[str, str]:
+        try:
+            if manifest_file is not None:
+                with open(manifest_file) as f:
+                    data = json.load(f)
+            else:
+                data = json.load(self.client.get_object(Bucket=bucket, Key=manifest_key)["Body"])
+        except (FileNotFoundError, self.client.exceptions.NoSuchKey):
+            return {}
+        # A local manifest might have been written for another destination
+        if data.get("bucket") != bucket or data.get("prefix") != key_prefix:
+            return {}
+        return data["files"]
+
+    def _write_manifest(self, bucket: str, key_prefix: str, manifest_key: str, manifest_file: str,
+                        files: dict[str, str]) -> None:
+        data = json.dumps(dict(bucket=bucket, prefix=key_prefix, files=files), indent=2, sort_keys=True)
+        if manifest_file is not None:
+            directory = os.path.dirname(manifest_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(manifest_file, "w") as f:
+                f.write(data)
+        else:
+            self.client.put_object(Bucket=bucket, Key=manifest_key, Body=data.encode(),
+                                   ContentType="application/json")
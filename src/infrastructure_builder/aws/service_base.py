@@ -1,5 +1,39 @@
+import threading
+import weakref
+from contextlib import contextmanager
+
 import boto3
 
+from infrastructure_builder import tracing
+from infrastructure_builder.aws.rate_limiter import get_rate_limiter
+
+
+# Clients per session, keyed by service name and region; Boto3 clients are thread-safe and can be shared
+_clients = weakref.WeakKeyDictionary()
+# Creating clients from the same session is not thread-safe
+_clients_lock = threading.Lock()
+# Session and region which are used by helpers created in the current thread without a session
+_context = threading.local()
+# Sessions of helpers created without a session, keyed by region, so they share their clients
+_default_sessions = {}
+
+
+@contextmanager
+def use_session(session: boto3.Session, region: str = None):
+    """
+    Context manager which makes all helpers, which are created in the current thread without a session, use the given
+    session and region.
+
+    :param session: The AWS session to use
+    :param region: The region to use, or None to use the session's region
+    """
+    previous = getattr(_context, "target", None)
+    _context.target = (session, region)
+    try:
+        yield
+    finally:
+        _context.target = previous
+
 
 class ServiceBase:
     """
@@ -12,11 +46,21 @@ class ServiceBase:
         """
         Initializes a new instances.
 
-        :param session: The AWS session to use, or None to create a new one
+        :param session: The AWS session to use, or None to use the default session of the region (or the session set
+                        by use_session())
         :param region: The region to use, or None to use the default region or the session's region
         """
+        target = getattr(_context, "target", None)
+        if session is None and target is not None:
+            session = target[0]
+            region = target[1] if region is None else region
         self._region = region
-        self._session = boto3.Session(region_name=region) if session is None else session
+        if session is None:
+            with _clients_lock:
+                session = _default_sessions.get(region)
+                if session is None:
+                    session = _default_sessions[region] = boto3.Session(region_name=region)
+        self._session = session
 
     @property
     def region(self) -> str:
@@ -33,3 +77,24 @@ class ServiceBase:
         :return: The session
         """
         return self._session
+
+    def create_client(self, service_name: str, region_name: str = None):
+        """
+        Returns a Boto3 client for an AWS service. Clients are pooled, i.e. all helpers with the same session share
+        their clients. All clients of a service and region share a rate limiter, which slows down requests as soon as
+        AWS throttles them. While tracing is enabled, the client's API calls will be traced.
+
+        :param service_name: The name of the AWS service, e.g. "s3"
+        :param region_name: The region to use, or None to use this helper's region
+        :return: A Boto3 client
+        """
+        region_name = self.region if region_name is None else region_name
+        with _clients_lock:
+            session_clients = _clients.setdefault(self.session, {})
+            client = session_clients.get((service_name, region_name))
+            if client is None:
+                client = self.session.client(service_name, region_name=region_name)
+                get_rate_limiter(service_name, client.meta.region_name).attach(client)
+                tracing.instrument_client(client)
+                session_clients[(service_name, region_name)] = client
+        return client
@@ -18,7 +18,7 @@ class SystemsManager(ServiceBase):
         Returns a Boto3 client for AWS Systems Manager. The client object is cached.
         :return: A Boto3 client for AWS Systems Manager
         """
-        return self.session.client("ssm", region_name=self.region)
+        return self.create_client("ssm")
 
     def get_secure_string(self, parameter_name: str) -> str:
         """
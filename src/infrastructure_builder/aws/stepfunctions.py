@@ -6,10 +6,66 @@ from time import sleep
 
 import boto3
 
+from infrastructure_builder import tracing
 from infrastructure_builder.aws.service_base import ServiceBase
 from infrastructure_builder.exceptions import BuilderError
 
 
+logger = logging.getLogger(__name__)
+
+FINAL_EVENT_SUFFIXES = ("Failed", "TimedOut", "Aborted")
+
+
+class ExecutionHistoryTailer:
+    """
+    Follows the history of a state machine execution. Each poll returns only the events which have been added since
+    the last poll: the tailer remembers the token of the last page of the history, so it re-reads at most one page
+    instead of the whole history.
+    """
+    execution_arn: str
+
+    def __init__(self, client, execution_arn: str):
+        """
+        Initializes a new tailer.
+
+        :param client: A Boto3 client for AWS Step Functions
+        :param execution_arn: The ARN of the execution
+        """
+        self._client = client
+        self.execution_arn = execution_arn
+        self._last_page_token = None
+        self._last_event_id = 0
+
+    def poll(self) -> list[dict]:
+        """
+        Fetches all new events of the execution history.
+
+        :return: List of events, in chronological order
+        """
+        events = []
+        token = self._last_page_token
+        while True:
+            args = dict(executionArn=self.execution_arn, maxResults=1000)
+            if token is not None:
+                args["nextToken"] = token
+            try:
+                resp = self._client.get_execution_history(**args)
+            except self._client.exceptions.InvalidToken:
+                # Tokens expire after 24 hours, start over and skip all known events
+                token = None
+                continue
+
+            events.extend(event for event in resp["events"] if event["id"] > self._last_event_id)
+            if "nextToken" not in resp:
+                break
+            token = resp["nextToken"]
+
+        self._last_page_token = token
+        if events:
+            self._last_event_id = events[-1]["id"]
+        return events
+
+
 class StepFunctions(ServiceBase):
     """
     Helper functions for AWS Step Functions
@@ -23,56 +79,134 @@ class StepFunctions(ServiceBase):
         Returns a Boto3 client for AWS Step Functions. The client object is cached.
         :return: A Boto3 client for AWS Step Functions
         """
-        return self.session.client("stepfunctions", region_name=self.region)
+        return self.create_client("stepfunctions")
 
     def execute(self, state_machine_arn: str, input_data: str = None, timeout: int = 15,
-                wait_until_completed: bool = True) -> str:
+                wait_until_completed: bool = True, express: bool = False) -> str:
         """
         Executes a state machine. The function returns either immediately, or it will wait until the state machine has
         finished.
 
-        If wait_until_completed is True, any state changes will be logged via Python logging module at info level.
+        If wait_until_completed is True, any state changes will be logged via Python logging module at info level,
+        including the time spent in each state.
+
+        Express workflows do not have an execution history which could be followed. If express is True, the state
+        machine will be executed synchronously (which is limited to 5 minutes by AWS), and its result will be logged.
 
         :param state_machine_arn: The ARN of the state machine.
         :param input_data: The JSON input data.
         :param timeout: The maximum time to wait for the job to finish (in minutes). If the job takes more time, an
-            BuilderError exception will be raised. The job will continue to run, it will not be aborted!
+            BuilderError exception will be raised. The job will continue to run, it will not be aborted! The timeout
+            does not apply to express workflows.
         :param wait_until_completed: If False, this method will return immediately after submit, else will wait until
             the job has finished or the timeout has been reached.
+        :param express: If True, the state machine is an express workflow.
         :return: Job ID
         """
-        result = self.client.start_execution(stateMachineArn=state_machine_arn, input=input_data)
+        args = dict(stateMachineArn=state_machine_arn)
+        if input_data is not None:
+            args["input"] = input_data
+
+        if express and wait_until_completed:
+            logger.info("Express state machine started, now waiting until completed.")
+            with tracing.span("stepfunctions.wait", "wait", execution=state_machine_arn):
+                result = self.client.start_sync_execution(**args)
+            logger.info(f"Status: {result['status']}")
+            self._log_execution_error(result, "")
+            return result["executionArn"]
+
+        result = self.client.start_execution(**args)
         execution_arn = result["executionArn"]
         if not wait_until_completed:
             return execution_arn
 
-        logging.info("State submitted, now waiting until completed.")
-        last_status = None
-        start = datetime.now(timezone.utc) - timedelta(seconds=30)
-        end = start + timedelta(minutes=timeout)
-        while True:
-            if datetime.now(timezone.utc) > end:
-                raise BuilderError("Timeout")
-
-            execution_description = self.client.describe_execution(executionArn=execution_arn)
-            status = execution_description["status"]
-            if status != last_status:
-                last_status = status
-                logging.info(f"Status: {status}")
-            if status not in ["RUNNING"]:
-                break
-
-            sleep(5)
-
-        if last_status != "SUCCEEDED":
-            if "error" in execution_description:
-                logging.info(f"Error: {execution_description['error']}")
-            if "cause" in execution_description:
-                logging.info(f"Cause: {execution_description['cause']}")
+        logger.info("State submitted, now waiting until completed.")
+        self.wait_for_executions([execution_arn], timeout)
 
         # https://region.console.aws.amazon.com/states/home?region=region#/v2/executions/details/arn:...
         aws_region = re.match(r"arn:aws:states:(.*?):.*", execution_arn).group(1)
         url = f"https://{aws_region}.console.aws.amazon.com/states/home?region={aws_region}#/v2/executions/details/{execution_arn}"
-        logging.info(f"Execution details in AWS console: {url}")
+        logger.info(f"Execution details in AWS console: {url}")
 
         return execution_arn
+
+    def wait_for_executions(self, execution_arns: list[str], timeout: int = 15,
+                            stream_history: bool = True) -> list[dict]:
+        """
+        Waits until state machine executions have finished. Any status changes will be logged via Python logging module
+        at info level. If stream_history is True, the history of each execution will be followed, i.e. each state which
+        has been entered or exited will be logged, including the time spent in the state. If there are several
+        executions, each message is prefixed with the execution name.
+
+        Executions of express workflows cannot be waited for, see execute().
+
+        :param execution_arns: The ARNs of the executions.
+        :param timeout: The maximum time to wait for the executions to finish (in minutes). If they take more time, an
+            BuilderError exception will be raised. The executions will continue to run, they will not be aborted!
+        :param stream_history: If True, the state transitions of the executions will be logged while waiting.
+        :return: List with the description of each execution, in the same order as the ARNs
+        """
+        last_status = {}
+        descriptions = {}
+        tailers = {execution_arn: ExecutionHistoryTailer(self.client, execution_arn)
+                   for execution_arn in execution_arns}
+        state_entered = {execution_arn: {} for execution_arn in execution_arns}
+        start = datetime.now(timezone.utc) - timedelta(seconds=30)
+        end = start + timedelta(minutes=timeout)
+
+        def log_prefix(execution_arn: str) -> str:
+            return f"[{execution_arn.split(':')[-1]}] " if len(execution_arns) > 1 else ""
+
+        def log_history(execution_arn: str) -> None:
+            for event in tailers[execution_arn].poll():
+                event_type = event["type"]
+                if "stateEnteredEventDetails" in event:
+                    name = event["stateEnteredEventDetails"]["name"]
+                    state_entered[execution_arn][name] = event["timestamp"]
+                    logger.info(f"{log_prefix(execution_arn)}State {name} entered")
+                elif "stateExitedEventDetails" in event:
+                    name = event["stateExitedEventDetails"]["name"]
+                    entered = state_entered[execution_arn].pop(name, None)
+                    duration = "" if entered is None else \
+                        f" after {(event['timestamp'] - entered).total_seconds():.1f}s"
+                    logger.info(f"{log_prefix(execution_arn)}State {name} exited{duration}")
+                elif event_type.endswith(FINAL_EVENT_SUFFIXES):
+                    details = next((value for key, value in event.items() if key.endswith("EventDetails")), {})
+                    logger.info(f"{log_prefix(execution_arn)}{event_type}: {details.get('error', '')} "
+                                f"{details.get('cause', '')}".rstrip())
+
+        with tracing.span("stepfunctions.wait", "wait", executions=len(execution_arns)):
+            while True:
+                if datetime.now(timezone.utc) > end:
+                    raise BuilderError("Timeout")
+
+                for execution_arn in execution_arns:
+                    if last_status.get(execution_arn, "RUNNING") != "RUNNING":
+                        continue
+                    description = self.client.describe_execution(executionArn=execution_arn)
+                    descriptions[execution_arn] = description
+                    if stream_history:
+                        # Also done when the execution has just finished, to get its last events
+                        log_history(execution_arn)
+                    status = description["status"]
+                    if status != last_status.get(execution_arn):
+                        last_status[execution_arn] = status
+                        logger.info(f"{log_prefix(execution_arn)}Status: {status}")
+                    if status != "RUNNING":
+                        self._log_execution_error(description, log_prefix(execution_arn))
+
+                if all(status != "RUNNING" for status in last_status.values()) and \
+                        len(last_status) == len(execution_arns):
+                    break
+
+                sleep(5)
+
+        return [descriptions[execution_arn] for execution_arn in execution_arns]
+
+    @staticmethod
+    def _log_execution_error(description: dict, prefix: str) -> None:
+        if description["status"] != "SUCCEEDED":
+            if "error" in description:
+                logger.info(f"{prefix}Error: {description['error']}")
+            if "cause" in description:
+                logger.info(f"{prefix}Cause: {description['cause']}")
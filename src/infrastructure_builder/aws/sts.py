@@ -18,7 +18,7 @@ class SecurityTokenService(ServiceBase):
         Returns a Boto3 client for AWS Security Token Service. The client object is cached.
         :return: A Boto3 client for AWS Security Token Service
         """
-        return self.session.client("sts", region_name=self.region)
+        return self.create_client("sts")
 
     def get_session_token(self) -> tuple:
         """
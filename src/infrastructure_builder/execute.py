@@ -1,11 +1,23 @@
+import asyncio
 import logging
+import os
+import signal
 import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, Callable, Iterable, Union
 
 from infrastructure_builder.exceptions import BuilderError
 
 
 logger = logging.getLogger(__name__)
 
+# Maximum length of a line read by the asyncio variants
+_STREAM_LIMIT = 1024 * 1024
+# Time to wait after SIGTERM before a process group gets killed
+_TERMINATE_GRACE_PERIOD = 5
+
 
 def execute(command: list[str], inp: str = None, output_file: str = None, env=None):
     """
@@ -57,3 +69,346 @@ def execute_live(command: list[str], inp: str = None, env=None) -> None:
     proc.wait(5)
     if proc.returncode != 0:
         raise BuilderError(f"Execution failed with error code {proc.returncode}")
+
+
+def _feed_stdin(stdin, inp: bytes) -> None:
+    try:
+        stdin.write(inp)
+    except BrokenPipeError:
+        # The command has exited without reading all of its input; its return code tells what happened
+        pass
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def _read_tail(stream, max_size: int, chunk_size: int) -> bytes:
+    tail = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        tail += chunk
+        if len(tail) > max_size:
+            del tail[:len(tail) - max_size]
+    return bytes(tail)
+
+
+def execute_streaming(command: list[str], output_file: str, inp: Union[str, bytes] = None, env=None,
+                      stderr_tail_size: int = 64 * 1024, chunk_size: int = 64 * 1024) -> int:
+    """
+    Execute an external command, wait until it terminates, and write its output to a file while the command is
+    running. In contrast to execute(), the output is never held in memory: standard output goes straight to the file,
+    and only the last stderr_tail_size bytes of standard error are kept for error reporting. The output is written as
+    is, i.e. binary output (e.g. of docker save or pg_dump) is supported.
+
+    If the command returns with an error code, the stderr tail will be logged and a BuilderError exception will be
+    risen.
+
+    :param command: The command to execute.
+    :param output_file: The output of the command is written to a file with this filename.
+    :param inp: The input data to pass to the command; a string will be encoded as UTF-8.
+    :param env: A dictionary with environment variables (optional); please do not forget to add the variables of the
+                current process if needed. If None, the environment of the current process will be passed to the
+                external command.
+    :param stderr_tail_size: The maximum number of bytes of standard error which are kept for error reporting.
+    :param chunk_size: The number of bytes to read from standard error at once.
+    :return: The return code of the command, which is always 0
+    """
+    if isinstance(inp, str):
+        inp = inp.encode("utf-8")
+
+    with open(output_file, "wb") as f:
+        proc = subprocess.Popen(command, stdout=f, stderr=subprocess.PIPE, env=env,
+                                stdin=subprocess.DEVNULL if inp is None else subprocess.PIPE)
+        # Feed standard input in a separate thread, otherwise a command which writes a lot to standard error before
+        # reading all of its input would block forever
+        stdin_writer = None
+        if inp is not None:
+            stdin_writer = threading.Thread(target=_feed_stdin, args=(proc.stdin, inp), daemon=True)
+            stdin_writer.start()
+        stderr_tail = _read_tail(proc.stderr, stderr_tail_size, chunk_size)
+        proc.stderr.close()
+        proc.wait()
+        if stdin_writer is not None:
+            stdin_writer.join()
+
+    if proc.returncode != 0:
+        logger.error(stderr_tail.decode("utf-8", errors="replace"))
+        raise BuilderError(f"Execution failed with error code {proc.returncode}")
+    return proc.returncode
+
+
+def execute_parallel(commands: dict[str, list[str]], max_parallel: int = 4, env=None, fail_fast: bool = True) -> None:
+    """
+    Execute several external commands at once, wait until all of them terminate, and log their output live to standard
+    Python logging with info level. Each line is prefixed with the label of the command, e.g. "[api] Step 1/8".
+
+    Each command is read by its own thread, so this works on any platform (select() does not support pipes on Windows).
+
+    If a command returns with an error code and fail_fast is True, all commands which are still running will be
+    terminated and commands which have not been started yet will be skipped. If fail_fast is False, all commands will
+    be executed anyway. In both cases, a BuilderError exception will be risen which lists all failed commands. A command
+    which cannot be started, e.g. because its executable does not exist, fails like a command returning an error code.
+
+    :param commands: The commands to execute; a dictionary with a label as key and the command as value.
+    :param max_parallel: The maximum number of commands running at the same time.
+    :param env: A dictionary with environment variables (optional); please do not forget to add the variables of the
+                current process if needed. If None, the environment of the current process will be passed to the
+                external command.
+    :param fail_fast: If True, stop all other commands as soon as one command fails.
+    """
+    lock = threading.Lock()
+    running = {}
+    failed = {}
+    cancelled = threading.Event()
+
+    def fail(label: str, reason) -> None:
+        # Must be called while holding the lock
+        failed[label] = reason
+        if fail_fast:
+            cancelled.set()
+            for other_proc in running.values():
+                other_proc.terminate()
+
+    def run(label: str, command: list[str]) -> None:
+        with lock:
+            if cancelled.is_set():
+                return
+            try:
+                proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env,
+                                        stdin=subprocess.DEVNULL)
+            except OSError as err:
+                logger.error(f"[{label}] Execution failed: {err}")
+                fail(label, err.strerror or str(err))
+                return
+            running[label] = proc
+        with proc.stdout:
+            for line in proc.stdout:
+                line = line.removesuffix("\n")
+                logger.info(f"[{label}] {line}")
+        proc.wait()
+        with lock:
+            del running[label]
+            if proc.returncode == 0 or cancelled.is_set():
+                return
+            logger.error(f"[{label}] Execution failed with error code {proc.returncode}")
+            fail(label, proc.returncode)
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        futures = [executor.submit(run, label, command) for label, command in commands.items()]
+        for future in futures:
+            future.result()
+
+    if failed:
+        raise BuilderError(f"Execution failed: {', '.join(f'{label} ({code})' for label, code in failed.items())}")
+
+
+def _process_group_args() -> dict:
+    if sys.platform == "win32":
+        return dict(creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    return dict(start_new_session=True)
+
+
+def _signal_process_group(proc: asyncio.subprocess.Process, kill: bool) -> None:
+    if proc.returncode is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            if kill:
+                proc.kill()
+            else:
+                proc.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL if kill else signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+async def _terminate_process_group(proc: asyncio.subprocess.Process) -> None:
+    _signal_process_group(proc, kill=False)
+    try:
+        await asyncio.wait_for(proc.wait(), _TERMINATE_GRACE_PERIOD)
+    except asyncio.TimeoutError:
+        _signal_process_group(proc, kill=True)
+        await proc.wait()
+
+
+async def _write_stdin(stdin: asyncio.StreamWriter,
+                       inp: Union[str, bytes, Iterable[bytes], AsyncIterable[bytes]]) -> None:
+    try:
+        if isinstance(inp, str):
+            inp = inp.encode("utf-8")
+        if isinstance(inp, bytes):
+            stdin.write(inp)
+            await stdin.drain()
+        elif hasattr(inp, "__aiter__"):
+            async for chunk in inp:
+                stdin.write(chunk)
+                await stdin.drain()
+        else:
+            for chunk in inp:
+                stdin.write(chunk)
+                await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # The command has exited without reading all of its input; its return code tells what happened
+        pass
+    finally:
+        stdin.close()
+
+
+async def _read_line(stream: asyncio.StreamReader) -> tuple[bytes, bool]:
+    # Returns the next line and whether it is complete; a line longer than the stream limit is returned in chunks
+    try:
+        return await stream.readuntil(b"\n"), True
+    except asyncio.IncompleteReadError as err:
+        return err.partial, True
+    except asyncio.LimitOverrunError as err:
+        return await stream.read(max(1, err.consumed)), False
+
+
+async def _read_stream(stream: asyncio.StreamReader, on_data: Callable[[bytes], None], lines: bool,
+                       last_activity: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    complete = True
+    while True:
+        if lines:
+            previous_complete = complete
+            data, complete = await _read_line(stream)
+            if data == b"\n" and not previous_complete:
+                # Just the end of a long line which has been passed on in chunks already
+                continue
+        else:
+            data = await stream.read(_STREAM_LIMIT)
+        if not data:
+            break
+        last_activity[0] = loop.time()
+        on_data(data)
+
+
+async def _run_async(command: list[str], inp, env, merge_stderr: bool, on_stdout: Callable[[bytes], None],
+                     on_stderr: Callable[[bytes], None], lines: bool, timeout: float, idle_timeout: float) -> int:
+    loop = asyncio.get_running_loop()
+    proc = await asyncio.create_subprocess_exec(
+        *command, env=env, limit=_STREAM_LIMIT,
+        stdin=subprocess.DEVNULL if inp is None else subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        **_process_group_args())
+    last_activity = [loop.time()]
+
+    async def run_to_completion() -> int:
+        coroutines = [_read_stream(proc.stdout, on_stdout, lines, last_activity)]
+        if not merge_stderr:
+            coroutines.append(_read_stream(proc.stderr, on_stderr, lines, last_activity))
+        if inp is not None:
+            coroutines.append(_write_stdin(proc.stdin, inp))
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # If one of them fails, e.g. a callback, the others must not keep running
+            for task in tasks:
+                task.cancel()
+        return await proc.wait()
+
+    completion = asyncio.ensure_future(run_to_completion())
+    deadline = None if timeout is None else loop.time() + timeout
+    try:
+        while True:
+            wait_times = []
+            if deadline is not None:
+                wait_times.append(deadline - loop.time())
+            if idle_timeout is not None:
+                wait_times.append(last_activity[0] + idle_timeout - loop.time())
+            await asyncio.wait({completion}, timeout=max(0.0, min(wait_times)) if wait_times else None)
+            if completion.done():
+                return completion.result()
+
+            now = loop.time()
+            if deadline is not None and now >= deadline:
+                raise BuilderError(f"Timeout: command did not finish within {timeout} seconds")
+            if idle_timeout is not None and now >= last_activity[0] + idle_timeout:
+                raise BuilderError(f"Timeout: command did not write any output for {idle_timeout} seconds")
+    finally:
+        # Timeout, cancellation or any other error (e.g. raised by a callback): do not leave the command (and its
+        # children) behind
+        if not completion.done():
+            completion.cancel()
+        if proc.returncode is None:
+            await asyncio.shield(_terminate_process_group(proc))
+
+
+async def execute_async(command: list[str], inp: Union[str, bytes, Iterable[bytes], AsyncIterable[bytes]] = None,
+                        env=None, timeout: float = None, idle_timeout: float = None) -> subprocess.CompletedProcess:
+    """
+    Coroutine variant of execute(): execute an external command, wait until it terminates, and return a
+    CompletedProcess instance with the decoded output.
+
+    The command runs in its own process group. If a timeout is reached or the calling task is cancelled, the whole
+    process group will be terminated (and killed if it does not terminate within a few seconds).
+
+    If the command returns with an error code or a timeout is reached, a BuilderError exception will be risen.
+
+    :param command: The command to execute.
+    :param inp: The input data to pass to the command; a string, bytes, or an (async) iterable of bytes which is
+                streamed to the command, e.g. to pass large inputs.
+    :param env: A dictionary with environment variables (optional); please do not forget to add the variables of the
+                current process if needed. If None, the environment of the current process will be passed to the
+                external command.
+    :param timeout: The maximum time in seconds the command may run, or None to wait forever.
+    :param idle_timeout: The maximum time in seconds the command may run without writing any output, or None to wait
+                         forever.
+    :return: A CompletedProcess instance
+    """
+    stdout = bytearray()
+    stderr = bytearray()
+    returncode = await _run_async(command, inp, env, False, stdout.extend, stderr.extend, False,
+                                  timeout, idle_timeout)
+    result = subprocess.CompletedProcess(command, returncode,
+                                         stdout.decode("utf-8", errors="replace"),
+                                         stderr.decode("utf-8", errors="replace"))
+    if result.returncode != 0:
+        logger.error(result.stderr)
+        logger.error(result.stdout)
+        raise BuilderError(f"Execution failed with error code {result.returncode}")
+    return result
+
+
+async def execute_live_async(command: list[str],
+                             inp: Union[str, bytes, Iterable[bytes], AsyncIterable[bytes]] = None,
+                             env=None, on_line: Callable[[str], None] = None, timeout: float = None,
+                             idle_timeout: float = None) -> None:
+    """
+    Coroutine variant of execute_live(): execute an external command, wait until it terminates, and pass each line of
+    the command's output (standard output and standard error) to a callback while the command is running. By default,
+    each line is logged to standard Python logging with info level.
+
+    The command runs in its own process group. If a timeout is reached or the calling task is cancelled, the whole
+    process group will be terminated (and killed if it does not terminate within a few seconds).
+
+    If the command returns with an error code or a timeout is reached, a BuilderError exception will be risen.
+
+    :param command: The command to execute.
+    :param inp: The input data to pass to the command; a string, bytes, or an (async) iterable of bytes which is
+                streamed to the command, e.g. to pass large inputs.
+    :param env: A dictionary with environment variables (optional); please do not forget to add the variables of the
+                current process if needed. If None, the environment of the current process will be passed to the
+                external command.
+    :param on_line: A function which is called with each line of output (without line break), or None to log it. A
+                    line longer than 1 MiB is passed in several chunks.
+    :param timeout: The maximum time in seconds the command may run, or None to wait forever.
+    :param idle_timeout: The maximum time in seconds the command may run without writing any output, or None to wait
+                         forever.
+    """
+    if on_line is None:
+        on_line = logger.info
+
+    def on_data(data: bytes) -> None:
+        on_line(data.decode("utf-8", errors="replace").removesuffix("\n"))
+
+    returncode = await _run_async(command, inp, env, True, on_data, None, True, timeout, idle_timeout)
+    if returncode != 0:
+        raise BuilderError(f"Execution failed with error code {returncode}")
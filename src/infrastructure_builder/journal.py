@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """
+    Journal of a run, i.e. of a sequence of tasks. It records when each task has been started and finished, its output,
+    or why it failed. The journal is stored as a JSON file which is rewritten after each update, so a failed run can
+    be resumed later on.
+    """
+    filename: str
+    entries: list[dict]
+
+    def __init__(self, filename: str, task_names: list[str]):
+        """
+        Creates a new journal for a run. The journal file will be written on the first update.
+
+        :param filename: The filename of the journal.
+        :param task_names: The names of all tasks of the run, in order of execution.
+        """
+        self.filename = filename
+        self.entries = [dict(name=name, status="pending") for name in task_names]
+
+    @classmethod
+    def load(cls, filename: str) -> Optional["RunJournal"]:
+        """
+        Loads a journal.
+
+        :param filename: The filename of the journal.
+        :return: The journal, or None if the file does not exist
+        """
+        try:
+            with open(filename) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        journal = cls(filename, [])
+        journal.entries = data["tasks"]
+        return journal
+
+    @property
+    def task_names(self) -> list[str]:
+        """
+        Returns the names of all tasks of the run, in order of execution.
+        :return: List of task names
+        """
+        return [entry["name"] for entry in self.entries]
+
+    def is_finished(self, index: int) -> bool:
+        """
+        Checks whether a task has been finished successfully, and its output is available.
+
+        :param index: The position of the task in the run.
+        :return: True if the task has been finished
+        """
+        return self.entries[index]["status"] == "finished"
+
+    def output(self, index: int) -> Any:
+        """
+        Returns the output of a finished task.
+
+        :param index: The position of the task in the run.
+        :return: The output, i.e. the return value of the task
+        """
+        return self.entries[index].get("output")
+
+    def start(self, index: int) -> None:
+        """
+        Records the start of a task.
+
+        :param index: The position of the task in the run.
+        """
+        self.entries[index] = dict(name=self.entries[index]["name"], status="started", started=self._now())
+        self._save()
+
+    def finish(self, index: int, output: Any) -> None:
+        """
+        Records the successful end of a task. If the output cannot be stored as JSON, the task will be recorded as
+        incomplete, so it will be executed again when the run is resumed.
+
+        :param index: The position of the task in the run.
+        :param output: The output, i.e. the return value of the task.
+        """
+        entry = self.entries[index]
+        entry["finished"] = self._now()
+        try:
+            json.dumps(output)
+            entry["status"] = "finished"
+            entry["output"] = output
+        except (TypeError, ValueError):
+            logger.warning(f"Output of task {entry['name']} cannot be stored in journal, "
+                           f"task will be executed again on resume")
+            entry["status"] = "incomplete"
+        self._save()
+
+    def fail(self, index: int, error: BaseException) -> None:
+        """
+        Records the failure of a task.
+
+        :param index: The position of the task in the run.
+        :param error: The exception which stopped the task.
+        """
+        entry = self.entries[index]
+        entry["status"] = "failed"
+        entry["finished"] = self._now()
+        entry["error"] = f"{type(error).__name__}: {error}"
+        self._save()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first, so an interrupted run never leaves a corrupt journal behind
+        temp_filename = f"{self.filename}.tmp"
+        with open(temp_filename, "w") as f:
+            json.dump(dict(tasks=self.entries), f, indent=2)
+        os.replace(temp_filename, self.filename)
@@ -0,0 +1,198 @@
+import bisect
+import math
+import os
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from infrastructure_builder.tracing import Tracer
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_runs (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task TEXT NOT NULL,
+    duration REAL NOT NULL,
+    api_calls INTEGER NOT NULL,
+    wait_time REAL NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_runs_task ON task_runs(task, run_id);
+"""
+
+
+@dataclass
+class TaskMetrics:
+    task: str
+    duration: float
+    api_calls: int
+    wait_time: float
+    failed: bool = False
+
+
+@dataclass
+class TaskReport:
+    task: str
+    runs: int
+    last_duration: float
+    p50_duration: float
+    p95_duration: float
+    last_api_calls: int
+    last_wait_time: float
+    baseline_duration: Optional[float]
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """
+        Returns the duration of the last run relative to the median duration of the previous runs.
+        :return: The ratio, or None if there are not enough previous runs
+        """
+        if not self.baseline_duration:
+            return None
+        return self.last_duration / self.baseline_duration
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Calculates a percentile with the nearest-rank method.
+
+    :param values: The values, at least one
+    :param p: The percentile, e.g. 95
+    :return: The smallest value which is greater than or equal to p percent of all values
+    """
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def task_metrics(tracer: Tracer) -> list[TaskMetrics]:
+    """
+    Summarizes the spans of a run per task: the duration of the task, the number of AWS API calls, and the time spent
+    in wait loops while the task was running.
+
+    :param tracer: The tracer of the run
+    :return: List of metrics, one for each execution of a task
+    """
+    spans = sorted(tracer.get_spans(), key=lambda span: span.start)
+    starts = [span.start for span in spans]
+    metrics = []
+    for task_span in (span for span in spans if span.category == "task"):
+        # All spans which have been started while the task was running
+        task_spans = spans[bisect.bisect_left(starts, task_span.start):
+                           bisect.bisect_right(starts, task_span.start + task_span.duration)]
+        metrics.append(TaskMetrics(task_span.name, task_span.duration,
+                                   sum(1 for span in task_spans if span.category == "aws"),
+                                   sum(span.duration for span in task_spans if span.category == "wait"),
+                                   "error" in task_span.args))
+    return metrics
+
+
+class MetricsStore:
+    """
+    Stores metrics of all tasks of all runs in an SQLite database, so their durations can be compared over time.
+    """
+    filename: str
+
+    def __init__(self, filename: str):
+        """
+        Opens a metrics store. The database will be created on the first update.
+
+        :param filename: The filename of the database.
+        """
+        self.filename = filename
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.filename)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def record(self, metrics: list[TaskMetrics]) -> None:
+        """
+        Records the metrics of a run.
+
+        :param metrics: The metrics of all tasks of the run.
+        """
+        if not metrics:
+            return
+        with closing(self._connect()) as connection, connection:
+            run_id = connection.execute("INSERT INTO runs (started) VALUES (?)",
+                                        (datetime.now(timezone.utc).isoformat(),)).lastrowid
+            connection.executemany("INSERT INTO task_runs VALUES (?, ?, ?, ?, ?, ?)",
+                                   [(run_id, m.task, m.duration, m.api_calls, m.wait_time, int(m.failed))
+                                    for m in metrics])
+
+    def report(self, recent_runs: int = 20) -> list[TaskReport]:
+        """
+        Summarizes the recent successful executions of each task. The duration of the last execution is compared with
+        the median duration of the previous executions (at least three are needed).
+
+        :param recent_runs: The number of recent executions of each task to take into account.
+        :return: List of task reports, ordered by task name
+        """
+        if not os.path.exists(self.filename):
+            return []
+        with closing(self._connect()) as connection:
+            rows = connection.execute("""
+                SELECT task, duration, api_calls, wait_time FROM (
+                    SELECT task, duration, api_calls, wait_time,
+                           ROW_NUMBER() OVER (PARTITION BY task ORDER BY run_id DESC, rowid DESC) AS position
+                    FROM task_runs WHERE failed = 0
+                ) WHERE position <= ? ORDER BY task, position
+            """, (recent_runs,)).fetchall()
+
+        executions = {}
+        for task, duration, api_calls, wait_time in rows:
+            executions.setdefault(task, []).append((duration, api_calls, wait_time))
+
+        reports = []
+        for task, values in executions.items():
+            durations = [duration for duration, _, _ in values]
+            last_duration, last_api_calls, last_wait_time = values[0]
+            baseline = percentile(durations[1:], 50) if len(durations) > 3 else None
+            reports.append(TaskReport(task, len(values), last_duration, percentile(durations, 50),
+                                      percentile(durations, 95), last_api_calls, last_wait_time, baseline))
+        return reports
+
+
+def format_report(reports: list[TaskReport], regression_threshold: float = 1.5) -> str:
+    """
+    Create a multiline string with a table of task reports. Tasks whose last duration is more than
+    regression_threshold times the median of the previous runs are flagged. Useful for printing to a console.
+
+    :param reports: The task reports.
+    :param regression_threshold: The ratio from which on a task is flagged as regressed.
+    :return: String with report table
+    """
+    header = ("Task", "Runs", "Last [s]", "p50 [s]", "p95 [s]", "API calls", "Wait [s]", "")
+    rows = [(report.task, str(report.runs), f"{report.last_duration:.3f}", f"{report.p50_duration:.3f}",
+             f"{report.p95_duration:.3f}", str(report.last_api_calls), f"{report.last_wait_time:.3f}",
+             f"REGRESSED ({report.ratio:.1f}x)" if is_regressed(report, regression_threshold) else "")
+            for report in reports]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    lines = [f"{row[0]: <{widths[0]}}  " +
+             "  ".join(f"{value: >{width}}" for value, width in zip(row[1:-1], widths[1:-1])) +
+             f"  {row[-1]}".rstrip()
+             for row in [header] + rows]
+    return "\n".join(lines)
+
+
+def is_regressed(report: TaskReport, regression_threshold: float = 1.5, min_increase: float = 1.0) -> bool:
+    """
+    Checks whether the last execution of a task took considerably longer than the previous ones. Short tasks are
+    ignored, their durations vary too much.
+
+    :param report: The task report.
+    :param regression_threshold: The ratio from which on a task is regressed.
+    :param min_increase: The minimum increase of the duration (in seconds) of a regressed task.
+    :return: True if the task has regressed
+    """
+    return (report.ratio is not None and report.ratio > regression_threshold and
+            report.last_duration - report.baseline_duration >= min_increase)
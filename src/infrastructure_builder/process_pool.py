@@ -0,0 +1,85 @@
+import logging
+import logging.handlers
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable
+
+from infrastructure_builder import tracing
+
+
+class _ForwardingHandler(logging.Handler):
+    """
+    Passes log records received from worker processes to the logger they have been created with, so they are handled
+    like records of the parent process.
+    """
+    def emit(self, record: logging.LogRecord) -> None:
+        logger = logging.getLogger(record.name)
+        if not logger.disabled:
+            logger.handle(record)
+
+
+def _logger_levels() -> dict[str, int]:
+    # The levels which have been set explicitly in the parent process, so workers do not send records which would be
+    # dropped anyway
+    levels = {name: logger.level for name, logger in logging.Logger.manager.loggerDict.items()
+              if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET}
+    levels[""] = logging.getLogger().level
+    return levels
+
+
+def _init_worker(queue: multiprocessing.Queue, levels: dict[str, int]) -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(queue))
+    for name, level in levels.items():
+        logging.getLogger(name or None).setLevel(level)
+    # Spans of a worker process would never reach the tracer of the parent process
+    tracing.set_tracer(None)
+
+
+class ProcessPool:
+    """
+    Pool of worker processes for CPU-bound functions, which would be serialized by the GIL in threads. Log records
+    created in the workers are forwarded to the handlers of the parent process.
+
+    Worker processes are always spawned, i.e. they start with a fresh interpreter which imports the main module again
+    (so it must be guarded by "if __name__ == '__main__'"). Functions, their arguments and their results are passed
+    between processes, so they must be picklable.
+    """
+    def __init__(self, max_workers: int = None):
+        """
+        Starts a new pool. The worker processes are started on demand.
+
+        :param max_workers: The maximum number of worker processes, or None for the number of CPUs
+        """
+        context = multiprocessing.get_context("spawn")
+        self._queue = context.Queue()
+        self._listener = logging.handlers.QueueListener(self._queue, _ForwardingHandler())
+        self._listener.start()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                                             initargs=(self._queue, _logger_levels()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        Executes a function in a worker process.
+
+        :param func: The function; it must be defined at module level
+        :return: The future of the function's result
+        """
+        return self._executor.submit(func, *args, **kwargs)
+
+    def close(self) -> None:
+        """
+        Waits until all running functions have been finished, cancels all functions which have not been started yet,
+        stops all worker processes, and forwards all pending log records.
+        """
+        self._executor.shutdown(cancel_futures=True)
+        self._listener.stop()
+        self._queue.close()
@@ -1,36 +1,165 @@
 import argparse
+import fnmatch
 import logging
+import os
+import pickle
+import re
 import sys
-from dataclasses import dataclass
-from typing import Callable, Optional
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Collection, Iterable, Optional
+
+from infrastructure_builder import tracing
+from infrastructure_builder.exceptions import BuilderError
+from infrastructure_builder.journal import RunJournal
+from infrastructure_builder.metrics import MetricsStore, format_report, is_regressed, task_metrics
+from infrastructure_builder.watch import FileWatcher, is_affected
+
+if TYPE_CHECKING:
+    from infrastructure_builder.process_pool import ProcessPool
 
 
 logger = logging.getLogger(__name__)
 
 
+NAMESPACE_SEPARATOR = ":"
+GLOB_CHARACTERS = re.compile(r"[*?\[]")
+
+
 @dataclass
 class Task:
     name: str
     description: str
     execute: Callable
+    tags: set[str] = field(default_factory=set)
+    inputs: list[str] = field(default_factory=list)
+    cpu_bound: bool = False
+    depends_on: set[str] = field(default_factory=set)
+
+
+class _TrieNode:
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children = {}
+        # All task names below this node, in order of registration
+        self.names = {}
+
+
+class _TaskIndex:
+    """
+    Index of all task names of a registry: prefix trees of the names and of the case-folded names, and the tasks per
+    tag. The index is updated whenever a task is registered, so that a lookup does not need to scan all tasks.
+    """
+    def __init__(self):
+        self._root = _TrieNode()
+        self._case_folded_root = _TrieNode()
+        self._case_folded = {}
+        self._tags = {}
+        self.task_descriptions = None
+
+    def add(self, task: Task, replaced_task: Optional[Task]) -> None:
+        if replaced_task is not None:
+            for tag in replaced_task.tags:
+                self._tags[tag.casefold()].pop(replaced_task.name, None)
+
+        case_folded_name = task.name.casefold()
+        for node, name in [(self._root, task.name), (self._case_folded_root, case_folded_name)]:
+            node.names[task.name] = None
+            for char in name:
+                node = node.children.setdefault(char, _TrieNode())
+                node.names[task.name] = None
+        self._case_folded.setdefault(case_folded_name, {})[task.name] = None
+        for tag in task.tags:
+            self._tags.setdefault(tag.casefold(), {})[task.name] = None
+        self.task_descriptions = None
+
+    def starting_with(self, prefix: str, case_sensitive: bool) -> Collection[str]:
+        node = self._root if case_sensitive else self._case_folded_root
+        for char in prefix if case_sensitive else prefix.casefold():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.names.keys()
+
+    def equal_ignoring_case(self, name: str) -> Collection[str]:
+        return self._case_folded.get(name.casefold(), {}).keys()
+
+    def tagged(self, tag: str) -> Collection[str]:
+        return self._tags.get(tag.casefold(), {}).keys()
+
+
+def _picklable(values: dict) -> dict:
+    result = {}
+    for key, value in values.items():
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue
+        result[key] = value
+    return result
+
+
+def _execute_in_worker(registry: type, name: str, outputs: dict, pending: set[str]) -> Any:
+    # Executed in a worker process; the task is looked up by name, as a function defined in a loop cannot be pickled
+    registry.outputs.update(outputs)
+    registry._pending_outputs = pending
+    return registry.tasks[name].execute()
 
 
 class TaskRegistry:
     """
     Registry for tasks.
+
+    A subclass which declares its own tasks dictionary ("tasks = {}") is a separate registry with its own tasks and
+    outputs; any other subclass shares the tasks of its parent.
     """
     tasks = {}
+    outputs = {}
+    journal_filename = os.path.join(".infrastructure-builder", "journal.json")
+    metrics_filename = os.path.join(".infrastructure-builder", "metrics.db")
+    # Maximum number of worker processes for CPU-bound tasks, or None for the number of CPUs
+    cpu_workers = None
+    _index = _TaskIndex()
+    # Tasks which are executed concurrently with the current CPU-bound task, so their outputs are not available yet
+    _pending_outputs = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "tasks" not in cls.__dict__:
+            return
+        cls.outputs = {}
+        cls._index = _TaskIndex()
+        for task in cls.tasks.values():
+            cls._index.add(task, None)
 
     @classmethod
-    def task(cls, name: str, description: str):
+    def task(cls, name: str, description: str, namespace: str = None, tags: Iterable[str] = None,
+             inputs: Iterable[str] = None, cpu_bound: bool = False, depends_on: Iterable[str] = None):
         """
         Decorator to mark a function as a task.
 
+        Tasks may be grouped by namespaces, e.g. "deploy:api:eu-west-1"; a namespace is just a prefix of the task name,
+        separated by a colon. Tasks can be selected by their namespace with a glob pattern (e.g. "deploy:*:eu-*"), or by
+        their tags (e.g. "@frontend").
+
         :param name: The task name
         :param description: The task description
+        :param namespace: The namespace (optional); if given, the full task name will be "<namespace>:<name>"
+        :param tags: The tags of the task (optional)
+        :param inputs: The files and directories the task reads, e.g. templates or source code (optional); in watch
+            mode, the task will be executed again whenever one of them changes
+        :param cpu_bound: If True, the task will be executed in a worker process, see execute_tasks() (optional)
+        :param depends_on: The names of CPU-bound tasks whose outputs this CPU-bound task reads (optional); it will not
+            be executed concurrently with them
         """
+        if namespace is not None:
+            name = f"{namespace}{NAMESPACE_SEPARATOR}{name}"
+
         def register_task(func):
-            cls.tasks[name] = Task(name, description, func)
+            task = Task(name, description, func, set(tags or []), list(inputs or []), cpu_bound, set(depends_on or []))
+            cls._index.add(task, cls.tasks.get(name))
+            cls.tasks[name] = task
             return func
 
         return register_task
@@ -54,23 +183,48 @@ class TaskRegistry:
             return task
 
         # Try case-insensitive
-        name_lower = name.lower()
-        candidates = [key for key in cls.tasks if key.lower() == name_lower]
+        candidates = cls._index.equal_ignoring_case(name)
         if len(candidates) == 1:
-            return cls.tasks[candidates[0]]
+            return cls.tasks[next(iter(candidates))]
 
         # Start of name matches
-        candidates = [key for key in cls.tasks if key.startswith(name)]
+        candidates = cls._index.starting_with(name, case_sensitive=True)
         if len(candidates) == 1:
-            return cls.tasks[candidates[0]]
+            return cls.tasks[next(iter(candidates))]
 
         # Start of name matches, case-insensitive
-        candidates = [key for key in cls.tasks if key.lower().startswith(name_lower)]
+        candidates = cls._index.starting_with(name, case_sensitive=False)
         if len(candidates) == 1:
-            return cls.tasks[candidates[0]]
+            return cls.tasks[next(iter(candidates))]
 
         return None
 
+    @classmethod
+    def select_tasks(cls, pattern: str) -> list[Task]:
+        """
+        Select tasks the following way:
+         - Pattern starts with @ -> all tasks with this tag
+         - Pattern contains *, ? or [ -> all tasks matching this glob pattern, case-insensitive
+         - Otherwise -> the task returned by get_task()
+
+        The tasks are returned in order of registration.
+
+        :param pattern: The tag, glob pattern or task name
+        :return: List of matching tasks, which is empty if no task matches
+        """
+        if pattern.startswith("@"):
+            return [cls.tasks[key] for key in cls._index.tagged(pattern[1:])]
+
+        glob_character = GLOB_CHARACTERS.search(pattern)
+        if glob_character is not None:
+            regex = re.compile(fnmatch.translate(pattern.casefold()))
+            # Only tasks which start with the literal part of the pattern can match
+            candidates = cls._index.starting_with(pattern[:glob_character.start()], case_sensitive=False)
+            return [cls.tasks[key] for key in candidates if regex.match(key.casefold())]
+
+        task = cls.get_task(pattern)
+        return [] if task is None else [task]
+
     @classmethod
     def format_task_descriptions(cls) -> str:
         """
@@ -79,11 +233,161 @@ class TaskRegistry:
 
         :return: String with all tasks and descriptions
         """
-        # Determine the length of the longest task name in order to print a table
-        all_tasks = cls.tasks.values()
-        max_task_name_len = max(len(t.name) for t in all_tasks)
-        task_descriptions = [f"{t.name: <{max_task_name_len}}  {t.description}" for t in all_tasks]
-        return "\n".join(task_descriptions)
+        if cls._index.task_descriptions is None:
+            # Determine the length of the longest task name in order to print a table
+            all_tasks = cls.tasks.values()
+            max_task_name_len = max(len(t.name) for t in all_tasks)
+            task_descriptions = [f"{t.name: <{max_task_name_len}}  {t.description}" for t in all_tasks]
+            cls._index.task_descriptions = "\n".join(task_descriptions)
+        return cls._index.task_descriptions
+
+    @classmethod
+    def get_output(cls, name: str) -> Any:
+        """
+        Returns the output, i.e. the return value, of a task which has been executed in the current run. When a run is
+        resumed, the output of a skipped task is taken from the journal.
+
+        :param name: The task name
+        :return: The output, or None if the task has not been executed
+        """
+        if name in cls._pending_outputs:
+            raise BuilderError(f"Output of task {name} is not available, the task is executed concurrently; add it to "
+                               f"depends_on of the reading task")
+        return cls.outputs.get(name)
+
+    @classmethod
+    def execute_tasks(cls, tasks: list[Task], journal: RunJournal = None, resume: bool = False) -> None:
+        """
+        Executes tasks one after another. If a journal is given, the start and end of each task, its output, or its
+        failure will be recorded in the journal.
+
+        CPU-bound tasks are executed in worker processes, so they are not slowed down by the GIL; consecutive CPU-bound
+        tasks are executed concurrently. A CPU-bound task which declares that it depends on one of them is executed
+        after it has been finished; reading the output of a concurrent task raises a BuilderError. The outputs of
+        previous tasks are passed to the workers, as far as they are picklable; the output of a CPU-bound task must be
+        picklable.
+
+        If a run is resumed, the journal must belong to the same list of tasks. All tasks up to the first one which has
+        not been finished in the journal will be skipped, and their outputs will be taken from the journal.
+
+        :param tasks: The tasks to execute
+        :param journal: The journal of this run (optional)
+        :param resume: If True, resume the run recorded in the journal
+        """
+        skipping = resume
+        pool = None
+        try:
+            index = 0
+            while index < len(tasks):
+                task = tasks[index]
+                if skipping and journal.is_finished(index):
+                    logger.info(f"Skipping task {task.name}, it has been finished already")
+                    cls.outputs[task.name] = journal.output(index)
+                    index += 1
+                    continue
+                skipping = False
+
+                if task.cpu_bound:
+                    # Up to the first task which depends on one of the tasks before
+                    end = index + 1
+                    while (end < len(tasks) and tasks[end].cpu_bound and
+                           not tasks[end].depends_on & {t.name for t in tasks[index:end]}):
+                        end += 1
+                    if pool is None:
+                        # Imported on demand, as multiprocessing would slow down the start of every script
+                        from infrastructure_builder.process_pool import ProcessPool
+                        pool = ProcessPool(cls.cpu_workers)
+                    cls._execute_in_processes(pool, tasks, range(index, end), journal)
+                    index = end
+                    continue
+
+                if journal is not None:
+                    journal.start(index)
+                try:
+                    with tracing.span(task.name, "task"):
+                        output = task.execute()
+                except BaseException as err:
+                    if journal is not None:
+                        journal.fail(index, err)
+                    raise
+                cls.outputs[task.name] = output
+                if journal is not None:
+                    journal.finish(index, output)
+                index += 1
+        finally:
+            if pool is not None:
+                pool.close()
+
+    @classmethod
+    def _execute_in_processes(cls, pool: "ProcessPool", tasks: list[Task], indexes: range,
+                              journal: Optional[RunJournal]) -> None:
+        outputs = _picklable(cls.outputs)
+        names = {tasks[index].name for index in indexes}
+        futures = []
+        end_times = {}
+        for index in indexes:
+            if journal is not None:
+                journal.start(index)
+            future = pool.submit(_execute_in_worker, cls, tasks[index].name, outputs, names - {tasks[index].name})
+            future.add_done_callback(lambda _, i=index: end_times.__setitem__(i, time.perf_counter()))
+            futures.append((index, time.perf_counter(), future))
+
+        error = None
+        for index, start, future in futures:
+            task = tasks[index]
+            try:
+                output = future.result()
+            except Exception as err:
+                if journal is not None:
+                    journal.fail(index, err)
+                error = error or err
+                continue
+            tracer = tracing.get_tracer()
+            if tracer is not None:
+                tracer.add_span(task.name, "task", start, end_times.get(index, time.perf_counter()), process=True)
+            cls.outputs[task.name] = output
+            if journal is not None:
+                journal.finish(index, output)
+        if error is not None:
+            raise error
+
+    @classmethod
+    def watch_tasks(cls, tasks: list[Task], debounce: float = 0.3, metrics: MetricsStore = None) -> None:
+        """
+        Executes tasks, then watches their inputs and executes the tasks again whose inputs have changed, until the
+        process is interrupted (Ctrl+C). Tasks without inputs are executed only once. A failed task does not stop
+        watching; it will be executed again on the next change.
+
+        If a metrics store is given, the metrics of each execution are recorded as a separate run, and the spans of
+        the active tracer are cleared afterwards; a trace contains the last execution only.
+
+        :param tasks: The tasks to execute
+        :param debounce: The time (in seconds) without changes after which affected tasks are executed
+        :param metrics: The store to record the metrics of each execution in (optional)
+        """
+        watched_tasks = [task for task in tasks if task.inputs]
+        with FileWatcher([path for task in watched_tasks for path in task.inputs], debounce) as watcher:
+            pending_tasks = tasks
+            try:
+                while True:
+                    try:
+                        cls.execute_tasks(pending_tasks)
+                    except Exception as err:
+                        logger.error(f"{type(err).__name__}: {err}")
+                    finally:
+                        tracer = tracing.get_tracer()
+                        if metrics is not None and tracer is not None:
+                            cls._record_metrics(metrics, tracer)
+                            tracer.clear()
+
+                    logger.info(f"Watching inputs of {len(watched_tasks)} tasks for changes")
+                    changed_paths = watcher.wait_for_changes()
+                    pending_tasks = [task for task in watched_tasks
+                                     if any(is_affected(path, task.inputs) for path in changed_paths)]
+                    logger.info(f"{len(changed_paths)} files changed, executing "
+                                f"{', '.join(task.name for task in pending_tasks) or 'no tasks'}")
+            except KeyboardInterrupt:
+                logger.info("Stopped watching")
 
     @classmethod
     def execute_from_command_line(cls) -> None:
@@ -94,15 +398,91 @@ class TaskRegistry:
         valid_tasks = f"Valid tasks:\n{cls.format_task_descriptions()}"
         parser = argparse.ArgumentParser(description="Build, run and deploy", epilog=valid_tasks,
                                          formatter_class=argparse.RawTextHelpFormatter)
-        parser.add_argument("tasks", metavar="task", type=str, nargs='+',
-                            help="Task to execute")
+        parser.add_argument("tasks", metavar="task", type=str, nargs='*',
+                            help="Task to execute; a task name, a glob pattern (e.g. 'deploy:*:eu-*'), or a tag "
+                                 "(e.g. '@frontend')")
+        parser.add_argument("--trace", metavar="FILE", type=str,
+                            help="Trace all tasks and AWS API calls, write them to FILE in Chrome trace format "
+                                 "(view with https://ui.perfetto.dev), and log a summary at the end")
+        parser.add_argument("--journal", metavar="FILE", type=str, default=cls.journal_filename,
+                            help=f"Record the run in journal FILE (default: {cls.journal_filename})")
+        parser.add_argument("--resume", action="store_true",
+                            help="Resume the run recorded in the journal: skip all tasks up to the first task which "
+                                 "has not been finished; tasks may be omitted")
+        parser.add_argument("--metrics", metavar="FILE", type=str, default=cls.metrics_filename,
+                            help=f"Record the duration, AWS API calls and wait time of each task in database FILE "
+                                 f"(default: {cls.metrics_filename})")
+        parser.add_argument("--no-metrics", action="store_true", help="Do not record metrics")
+        parser.add_argument("--report", action="store_true",
+                            help="Print the durations of all tasks in recent runs (median and 95th percentile) and "
+                                 "flag tasks which have become slower, then exit")
+        parser.add_argument("--watch", action="store_true",
+                            help="Execute the tasks, then watch their input files and execute the tasks again whose "
+                                 "inputs have changed, until interrupted")
         args = parser.parse_args(None if sys.argv[1:] else ["-h"])  # print help if no task was given
+        if args.report:
+            logger.info(f"Task durations of recent runs\n{format_report(MetricsStore(args.metrics).report())}")
+            return
+        if not args.tasks and not args.resume:
+            parser.error("the following arguments are required: task")
+        if args.watch and args.resume:
+            parser.error("argument --watch: not allowed with argument --resume")
 
+        tasks_to_execute = []
         for t in args.tasks:
-            task_to_execute = cls.get_task(t)
-            if task_to_execute is None:
+            selected_tasks = cls.select_tasks(t)
+            if not selected_tasks:
                 logging.error(f"Unknown task {t}")
                 logging.error(valid_tasks)
                 return
+            tasks_to_execute.extend(selected_tasks)
+        if args.watch and not any(t.inputs for t in tasks_to_execute):
+            logging.error("Cannot watch, none of the tasks declares inputs")
+            return
 
-            task_to_execute.execute()
+        if args.resume:
+            journal = RunJournal.load(args.journal)
+            if journal is None:
+                logging.error(f"Cannot resume, journal {args.journal} does not exist")
+                return
+            if not args.tasks:
+                unknown_tasks = [name for name in journal.task_names if name not in cls.tasks]
+                if unknown_tasks:
+                    logging.error(f"Cannot resume, unknown tasks in journal: {', '.join(unknown_tasks)}")
+                    return
+                tasks_to_execute = [cls.tasks[name] for name in journal.task_names]
+            elif [t.name for t in tasks_to_execute] != journal.task_names:
+                logging.error(f"Cannot resume, the journaled run executed other tasks: "
+                              f"{', '.join(journal.task_names)}")
+                return
+        else:
+            journal = RunJournal(args.journal, [t.name for t in tasks_to_execute])
+
+        tracer = None
+        if args.trace or not args.no_metrics:
+            tracer = tracing.Tracer()
+            tracing.set_tracer(tracer)
+        metrics = None if args.no_metrics else MetricsStore(args.metrics)
+        try:
+            if args.watch:
+                cls.watch_tasks(tasks_to_execute, metrics=metrics)
+            else:
+                cls.execute_tasks(tasks_to_execute, journal, args.resume)
+        finally:
+            tracing.set_tracer(None)
+            if args.trace:
+                tracer.write_chrome_trace(args.trace)
+                logger.info(f"Trace written to {args.trace}\n{tracer.format_summary()}")
+            # In watch mode, metrics have been recorded after each execution
+            if metrics is not None and not args.watch:
+                cls._record_metrics(metrics, tracer)
+
+    @classmethod
+    def _record_metrics(cls, store: MetricsStore, tracer: tracing.Tracer) -> None:
+        metrics = task_metrics(tracer)
+        store.record(metrics)
+        executed_tasks = {m.task for m in metrics if not m.failed}
+        for report in store.report():
+            if report.task in executed_tasks and is_regressed(report):
+                logger.warning(f"Task {report.task} took {report.last_duration:.1f}s, {report.ratio:.1f} times as "
+                               f"long as in previous runs (median {report.baseline_duration:.1f}s)")
@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "TransactionInProgressException",
+    "RequestLimitExceeded",
+    "BandwidthLimitExceeded",
+    "LimitExceededException",
+    "RequestThrottled",
+    "SlowDown",
+    "PriorRequestNotComplete",
+    "EC2ThrottledException",
+}
+
+
+def is_throttling_error(response) -> bool:
+    """
+    Checks whether a response of botocore's needs-retry event is a throttling error.
+
+    :param response: The response, a tuple (HTTP response, parsed response), or None
+    :return: True if the request has been throttled
+    """
+    if response is None:
+        return False
+    http_response, parsed = response
+    return (http_response.status_code == 429 or
+            parsed.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES)
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread_id: int
+    args: dict = field(default_factory=dict)
+
+
+class Tracer:
+    """
+    Collects spans, i.e. named time intervals, of a run. A span is either a task, an AWS API call, or a wait loop.
+    Spans can be exported in Chrome trace format (which can be viewed in Perfetto or chrome://tracing), or summarized
+    in a table.
+
+    The number of spans is limited, so a long-running process, e.g. in watch mode, does not run out of memory; if the
+    limit is reached, the oldest spans are dropped.
+    """
+    spans: deque[Span]
+
+    def __init__(self, max_spans: int = 100_000):
+        """
+        Initializes a new tracer without any spans.
+
+        :param max_spans: The maximum number of spans to keep.
+        """
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def add_span(self, name: str, category: str, start: float, end: float, **args) -> None:
+        """
+        Adds a span.
+
+        :param name: The name of the span, e.g. the task name or the API operation
+        :param category: The category, e.g. task, aws, or wait
+        :param start: The start time, a value of time.perf_counter()
+        :param end: The end time, a value of time.perf_counter()
+        :param args: Any additional data
+        """
+        span = Span(name, category, start - self._origin, end - start, threading.get_ident(), args)
+        with self._lock:
+            self.spans.append(span)
+
+    def get_spans(self) -> list[Span]:
+        """
+        Returns all spans recorded so far.
+
+        :return: List of spans, in the order they have been finished
+        """
+        with self._lock:
+            return list(self.spans)
+
+    def clear(self) -> None:
+        """
+        Removes all spans.
+        """
+        with self._lock:
+            self.spans.clear()
+
+    @contextmanager
+    def span(self, name: str, category: str, **args):
+        """
+        Context manager which records a span from entering until leaving the context. The context value is a
+        dictionary which may be used to add data to the span.
+
+        :param name: The name of the span
+        :param category: The category, e.g. task or wait
+        :param args: Any additional data
+        """
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as err:
+            args["error"] = type(err).__name__
+            raise
+        finally:
+            self.add_span(name, category, start, time.perf_counter(), **args)
+
+    def write_chrome_trace(self, filename: str) -> None:
+        """
+        Writes all spans to a file in Chrome trace format.
+
+        :param filename: The filename
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = [dict(name=span.name, cat=span.category, ph="X", pid=pid, tid=span.thread_id,
+                           ts=round(span.start * 1_000_000), dur=round(span.duration * 1_000_000), args=span.args)
+                      for span in self.spans]
+        with open(filename, "w") as f:
+            json.dump(dict(traceEvents=events, displayTimeUnit="ms"), f)
+
+    def format_summary(self) -> str:
+        """
+        Create a multiline string with a table which summarizes all spans by category and name, ordered by total
+        duration. Useful for printing to a console.
+
+        :return: String with summary table
+        """
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                total = totals.setdefault((span.category, span.name), [0, 0.0, 0.0, 0, 0])
+                total[0] += 1
+                total[1] += span.duration
+                total[2] = max(total[2], span.duration)
+                total[3] += span.args.get("retries", 0)
+                total[4] += span.args.get("throttles", 0)
+
+        header = ("Category", "Name", "Count", "Total [s]", "Max [s]", "Retries", "Throttles")
+        rows = [(category, name, str(count), f"{total:.3f}", f"{maximum:.3f}", str(retries), str(throttles))
+                for (category, name), (count, total, maximum, retries, throttles)
+                in sorted(totals.items(), key=lambda item: item[1][1], reverse=True)]
+        widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+        lines = [f"{row[0]: <{widths[0]}}  {row[1]: <{widths[1]}}  " +
+                 "  ".join(f"{value: >{width}}" for value, width in zip(row[2:], widths[2:]))
+                 for row in [header] + rows]
+        return "\n".join(lines)
+
+
+_tracer: Optional[Tracer] = None
+# Clients with event handlers, which record spans with the tracer active at the time of the call
+_instrumented_clients = weakref.WeakSet()
+_instrumented_clients_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """
+    Returns the active tracer.
+
+    :return: The active tracer, or None if tracing is disabled
+    """
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """
+    Activates a tracer. All API calls of AWS clients created by a ServiceBase helper will be recorded with this tracer
+    until another tracer is activated.
+
+    :param tracer: The tracer, or None to disable tracing
+    """
+    global _tracer
+    _tracer = tracer
+
+
+@contextmanager
+def span(name: str, category: str, **args):
+    """
+    Context manager which records a span with the active tracer. If tracing is disabled, nothing will be recorded.
+
+    :param name: The name of the span
+    :param category: The category, e.g. task or wait
+    :param args: Any additional data
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield args
+    else:
+        with tracer.span(name, category, **args) as span_args:
+            yield span_args
+
+
+def instrument_client(client) -> None:
+    """
+    Registers handlers for botocore events at a Boto3 client to record a span for each API call with the active
+    tracer; if tracing is disabled, nothing will be recorded. A span includes the number of retries and throttled
+    requests. A client is instrumented only once, so it may outlive any number of tracers.
+
+    :param client: The Boto3 client
+    """
+    with _instrumented_clients_lock:
+        if client in _instrumented_clients:
+            return
+        _instrumented_clients.add(client)
+
+    service_name = client.meta.service_model.service_name
+    service_event_name = client.meta.service_model.service_id.hyphenize()
+    region = client.meta.region_name
+
+    def before_call(model, context, **kwargs):
+        tracer = _tracer
+        if tracer is None:
+            return
+        # The span is recorded with the tracer which has been active when the call started
+        context["trace_tracer"] = tracer
+        context["trace_start"] = time.perf_counter()
+        context["trace_model"] = model
+        context["trace_throttles"] = 0
+
+    def needs_retry(response, request_dict, **kwargs):
+        context = request_dict["context"]
+        if "trace_tracer" in context and is_throttling_error(response):
+            context["trace_throttles"] += 1
+
+    def record(context, model, metadata: dict, error: Optional[str]):
+        tracer = context.pop("trace_tracer", None)
+        if tracer is None:
+            return
+        args = dict(service=service_name, operation=model.name, region=region,
+                    retries=metadata.get("RetryAttempts", 0), throttles=context["trace_throttles"])
+        if "HTTPStatusCode" in metadata:
+            args["status"] = metadata["HTTPStatusCode"]
+        if error is not None:
+            args["error"] = error
+        tracer.add_span(f"{service_name}.{model.name}", "aws", context["trace_start"], time.perf_counter(), **args)
+
+    def after_call(parsed, model, context, **kwargs):
+        record(context, model, parsed.get("ResponseMetadata", {}), parsed.get("Error", {}).get("Code"))
+
+    def after_call_error(exception, context, **kwargs):
+        if "trace_tracer" in context:
+            record(context, context["trace_model"], {}, type(exception).__name__)
+
+    # before-call is skipped if another handler provides the response (e.g. botocore's Stubber)
+    client.meta.events.register(f"before-parameter-build.{service_event_name}", before_call)
+    # The retry handler stops the event chain if a request has to be retried, so this handler must come first
+    client.meta.events.register_first(f"needs-retry.{service_event_name}", needs_retry)
+    client.meta.events.register(f"after-call.{service_event_name}", after_call)
+    client.meta.events.register(f"after-call-error.{service_event_name}", after_call_error)
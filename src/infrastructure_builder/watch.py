@@ -0,0 +1,208 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import sys
+import time
+from typing import Iterable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# See inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_WATCH_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | \
+                 _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+
+
+class _Inotify:
+    """
+    Minimal wrapper of the inotify API of Linux. It is only used to wake up a watcher; which files have changed is
+    determined by comparing snapshots, so the events themselves are not parsed.
+    """
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, directory: str) -> None:
+        # Watching a directory again just updates the existing watch
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            # The directory might have been deleted in the meantime
+            if error not in (errno.ENOENT, errno.ENOTDIR):
+                raise OSError(error, os.strerror(error))
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """
+        Waits until an event has been received, and discards all pending events.
+
+        :param timeout: The maximum time to wait (in seconds), or None to wait forever
+        :return: True if an event has been received, False on timeout
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """
+    Watches files and directories (including all subdirectories) for changes. On Linux, inotify is used to get notified
+    of changes; on other platforms, or if inotify is not available, the files are polled.
+
+    Bursts of changes, e.g. when an editor saves several files or a build tool writes its output, are debounced: the
+    watcher waits until no more changes happen for a short time, and reports all of them at once.
+    """
+    paths: list[str]
+    debounce: float
+    poll_interval: float
+
+    def __init__(self, paths: Iterable[str], debounce: float = 0.3, poll_interval: float = 1.0,
+                 use_inotify: bool = None):
+        """
+        Initializes a new watcher. Changes are reported relative to the state of the files at this time.
+
+        :param paths: The files and directories to watch.
+        :param debounce: The time (in seconds) without changes after which changes are reported.
+        :param poll_interval: The time (in seconds) between two scans if files are polled.
+        :param use_inotify: If False, the files are polled; if None, inotify is used if it is available.
+        """
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._inotify = None
+        if use_inotify or (use_inotify is None and sys.platform.startswith("linux")):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as err:
+                logger.warning(f"inotify is not available, polling files instead: {err}")
+        self._snapshot = self._scan()
+
+    @property
+    def uses_inotify(self) -> bool:
+        """
+        Returns whether inotify is used, or the files are polled.
+        :return: True if inotify is used
+        """
+        return self._inotify is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Releases all resources of the watcher.
+        """
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        # Modification time and size of each file
+        snapshot = {}
+        directories = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                for root, dirs, filenames in os.walk(path):
+                    directories.append(root)
+                    for filename in filenames:
+                        filename = os.path.join(root, filename)
+                        try:
+                            stat = os.stat(filename)
+                        except OSError:
+                            continue
+                        snapshot[filename] = (stat.st_mtime_ns, stat.st_size)
+            else:
+                # Watch the directory, so the file is noticed when an editor replaces it, or when it is created
+                directories.append(os.path.dirname(path))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        if self._inotify is not None:
+            for directory in directories:
+                self._inotify.add_watch(directory)
+        return snapshot
+
+    def _wait(self, timeout: Optional[float]) -> bool:
+        if self._inotify is not None:
+            return self._inotify.wait(timeout)
+        time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        return True
+
+    def wait_for_changes(self, timeout: float = None) -> set[str]:
+        """
+        Waits until files have been changed, created or deleted.
+
+        :param timeout: The maximum time to wait (in seconds), or None to wait forever.
+        :return: The absolute filenames of all changed files, or an empty set on timeout
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if end is None else max(0.0, end - time.monotonic())
+            if not self._wait(remaining) and self._inotify is not None:
+                return set()
+
+            snapshot = self._scan()
+            if snapshot != self._snapshot:
+                # Wait until the burst of changes is over
+                while True:
+                    if self._inotify is not None:
+                        if not self._inotify.wait(self.debounce):
+                            snapshot = self._scan()
+                            break
+                    else:
+                        time.sleep(self.debounce)
+                        previous_snapshot, snapshot = snapshot, self._scan()
+                        if snapshot == previous_snapshot:
+                            break
+
+                changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                           if snapshot.get(path) != self._snapshot.get(path)}
+                self._snapshot = snapshot
+                if changed:
+                    return changed
+
+            if end is not None and time.monotonic() >= end:
+                return set()
+
+
+def is_affected(path: str, inputs: Iterable[str]) -> bool:
+    """
+    Checks whether a file is one of the inputs, or is located in one of the input directories.
+
+    :param path: The absolute filename.
+    :param inputs: The filenames and directories.
+    :return: True if the file is one of the inputs
+    """
+    for input_path in inputs:
+        input_path = os.path.abspath(input_path)
+        if path == input_path or path.startswith(input_path.rstrip(os.sep) + os.sep):
+            return True
+    return False
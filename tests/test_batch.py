@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+
+import boto3
+from botocore.stub import Stubber
+
+from infrastructure_builder.aws.batch import Batch
+from infrastructure_builder.aws.logs import CloudWatchLogs
+
+
+def job(job_id: str, status: str, log_stream: str = None) -> dict:
+    description = dict(jobName=f"name-{job_id}", jobId=job_id, jobQueue="queue", status=status,
+                       startedAt=0, jobDefinition="definition")
+    if log_stream is not None:
+        description["container"] = dict(logStreamName=log_stream)
+    return description
+
+
+class TestWaitForJobs(unittest.TestCase):
+
+    def setUp(self):
+        session = boto3.Session(region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test")
+        self.batch = Batch(session)
+        self.batch_stubber = Stubber(self.batch.client)
+        self.batch_stubber.activate()
+        self.logs_stubber = Stubber(CloudWatchLogs(session).client)
+        self.logs_stubber.activate()
+        self.sleep = patch("infrastructure_builder.aws.batch.sleep").start()
+
+    def tearDown(self):
+        patch.stopall()
+        self.batch_stubber.deactivate()
+        self.logs_stubber.deactivate()
+
+    def expect_log_events(self, log_stream: str, *messages: str):
+        self.logs_stubber.add_response("get_log_events", dict(
+            events=[dict(timestamp=0, message=message, ingestionTime=0) for message in messages],
+            nextForwardToken="end"
+        ), dict(logGroupName="/aws/batch/job", logStreamName=log_stream, startFromHead=True))
+        self.logs_stubber.add_response("get_log_events", dict(events=[], nextForwardToken="end"))
+
+    def test_several_jobs(self):
+        self.batch_stubber.add_response("describe_jobs", dict(jobs=[
+            job("1", "RUNNING", "stream-1"), job("2", "RUNNABLE")
+        ]), dict(jobs=["1", "2"]))
+        self.expect_log_events("stream-1", "started")
+        # Finished jobs are not described again
+        self.batch_stubber.add_response("describe_jobs", dict(jobs=[
+            job("1", "SUCCEEDED", "stream-1"), job("2", "RUNNING", "stream-2")
+        ]), dict(jobs=["1", "2"]))
+        self.logs_stubber.add_response("get_log_events", dict(events=[], nextForwardToken="end"))
+        self.expect_log_events("stream-2", "hello")
+        self.batch_stubber.add_response("describe_jobs", dict(jobs=[job("2", "FAILED", "stream-2")]),
+                                        dict(jobs=["2"]))
+        self.logs_stubber.add_response("get_log_events", dict(events=[], nextForwardToken="end"))
+
+        with self.assertLogs("infrastructure_builder.aws.batch") as logs:
+            descriptions = self.batch.wait_for_jobs(["1", "2"])
+
+        self.assertEqual(["SUCCEEDED", "FAILED"], [description["status"] for description in descriptions])
+        self.assertEqual(["[name-1] Job status: RUNNING", "[name-1] started", "[name-2] Job status: RUNNABLE",
+                          "[name-1] Job status: SUCCEEDED", "[name-2] Job status: RUNNING", "[name-2] hello",
+                          "[name-2] Job status: FAILED"],
+                         [record.getMessage() for record in logs.records])
+        self.assertEqual(2, self.sleep.call_count)
+        self.batch_stubber.assert_no_pending_responses()
+        self.logs_stubber.assert_no_pending_responses()
+
+    def test_without_log_permission(self):
+        self.batch_stubber.add_response("describe_jobs", dict(jobs=[job("1", "RUNNING", "stream-1")]))
+        self.logs_stubber.add_client_error("get_log_events", "AccessDeniedException")
+        self.batch_stubber.add_response("describe_jobs", dict(jobs=[job("1", "SUCCEEDED", "stream-1")]))
+
+        with self.assertLogs("infrastructure_builder.aws.logs", level="WARNING"):
+            descriptions = self.batch.wait_for_jobs(["1"])
+        self.assertEqual("SUCCEEDED", descriptions[0]["status"])
+        self.logs_stubber.assert_no_pending_responses()
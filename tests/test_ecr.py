@@ -0,0 +1,154 @@
+import base64
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import call, patch
+
+import boto3
+from botocore.stub import Stubber
+
+from infrastructure_builder.aws.ecr import DockerImage, ElasticContainerRegistry, MANIFEST_MEDIA_TYPES
+from infrastructure_builder.aws.lambda_function import LambdaFunction
+
+NOW = datetime.now(timezone.utc)
+HOSTNAME = "123456789012.dkr.ecr.eu-west-1.amazonaws.com"
+MEDIA_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+
+
+def image(digest: str, days: int, tags: list[str] = None, media_type: str = None) -> dict:
+    details = dict(registryId="123456789012", repositoryName="api", imageDigest=digest,
+                   imagePushedAt=NOW - timedelta(days=days))
+    if tags:
+        details["imageTags"] = tags
+    if media_type:
+        details["imageManifestMediaType"] = media_type
+    return details
+
+
+class TestPruneImages(unittest.TestCase):
+
+    def setUp(self):
+        session = boto3.Session(region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test")
+        self.ecr = ElasticContainerRegistry(session)
+        self.ecr_stubber = Stubber(self.ecr.client)
+        self.ecr_stubber.activate()
+        self.lambda_stubber = Stubber(LambdaFunction(session).client)
+        self.lambda_stubber.activate()
+
+    def tearDown(self):
+        self.ecr_stubber.deactivate()
+        self.lambda_stubber.deactivate()
+
+    def test_prune(self):
+        self.lambda_stubber.add_response("list_functions", dict(Functions=[
+            dict(FunctionName="api", Version="1", PackageType="Image"),
+            dict(FunctionName="worker", Version="$LATEST", PackageType="Zip"),
+        ]), dict(FunctionVersion="ALL"))
+        self.lambda_stubber.add_response("get_function", dict(Code=dict(
+            ResolvedImageUri="123456789012.dkr.ecr.eu-west-1.amazonaws.com/api@sha256:v1"
+        )), dict(FunctionName="api", Qualifier="1"))
+
+        self.ecr_stubber.add_response("describe_repositories", dict(repositories=[
+            dict(repositoryName="api"), dict(repositoryName="other")
+        ]))
+        self.ecr_stubber.add_response("describe_images", dict(imageDetails=[
+            image("sha256:v3", 1, ["v3", "latest"], "application/vnd.oci.image.index.v1+json"),
+            image("sha256:v3-amd64", 1),
+            image("sha256:v2", 10, ["v2"]),
+            image("sha256:v1", 20, ["v1"]),
+            image("sha256:v0", 30, ["v0"]),
+            image("sha256:old", 30),
+            image("sha256:new", 2),
+        ]), dict(repositoryName="api"))
+        self.ecr_stubber.add_response("batch_get_image", dict(images=[dict(
+            imageId=dict(imageDigest="sha256:v3"),
+            imageManifest=json.dumps(dict(manifests=[dict(digest="sha256:v3-amd64")]))
+        )], failures=[]))
+        deleted_ids = [{"imageDigest": "sha256:old"}, {"imageDigest": "sha256:v0"}]
+        self.ecr_stubber.add_response("batch_delete_image", dict(imageIds=deleted_ids, failures=[]),
+                                      dict(repositoryName="api", imageIds=deleted_ids))
+
+        deleted = self.ecr.prune_images(repository_prefix="api", keep_tagged=2, untagged_older_than=timedelta(days=7))
+        self.assertEqual({"api": ["sha256:old", "sha256:v0"]}, deleted)
+        self.ecr_stubber.assert_no_pending_responses()
+        self.lambda_stubber.assert_no_pending_responses()
+
+
+def remote_image(tag: str, digest: str, config_digest: str) -> dict:
+    return dict(imageId=dict(imageTag=tag, imageDigest=digest), imageManifestMediaType=MEDIA_TYPE,
+                imageManifest=json.dumps(dict(config=dict(digest=config_digest))))
+
+
+class TestBuildAndPushImages(unittest.TestCase):
+
+    def setUp(self):
+        session = boto3.Session(region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test")
+        self.ecr = ElasticContainerRegistry(session)
+        self.stubber = Stubber(self.ecr.client)
+        self.stubber.activate()
+        self.stubber.add_response("get_authorization_token", dict(authorizationData=[dict(
+            authorizationToken=base64.b64encode(b"AWS:secret").decode("utf-8"),
+            proxyEndpoint=f"https://{HOSTNAME}"
+        )]))
+        self.execute_live = patch("infrastructure_builder.aws.ecr.execute_live").start()
+        self.execute_parallel = patch("infrastructure_builder.aws.ecr.execute_parallel").start()
+        self.execute = patch("infrastructure_builder.aws.ecr.execute").start()
+        self.execute.return_value.stdout = "sha256:config\n"
+
+    def tearDown(self):
+        patch.stopall()
+        self.stubber.deactivate()
+
+    def expect_remote_images(self, tags: list[str], images: list[dict]):
+        self.stubber.add_response("batch_get_image", dict(images=images, failures=[]), dict(
+            repositoryName="api", imageIds=[{"imageTag": tag} for tag in tags], acceptedMediaTypes=MANIFEST_MEDIA_TYPES
+        ))
+
+    def expect_put_image(self, tag: str, config_digest: str = "sha256:config"):
+        self.stubber.add_response("put_image", dict(), dict(
+            repositoryName="api", imageManifest=json.dumps(dict(config=dict(digest=config_digest))), imageTag=tag,
+            imageManifestMediaType=MEDIA_TYPE
+        ))
+
+    def assert_built(self):
+        self.execute_live.assert_called_once()
+        self.assertEqual(call({"api:v2": ["docker", "build", "--tag", f"{HOSTNAME}/api:v2",
+                                          "--tag", f"{HOSTNAME}/api:latest", "."]}, max_parallel=4),
+                         self.execute_parallel.call_args_list[0])
+        self.execute.assert_called_once_with(["docker", "image", "inspect", "--format", "{{.Id}}",
+                                              f"{HOSTNAME}/api:v2"])
+
+    def test_existing_under_other_tag(self):
+        self.expect_remote_images(["v2", "latest"], [remote_image("latest", "sha256:image", "sha256:config")])
+        self.expect_put_image("v2")
+
+        result = self.ecr.build_and_push_images([DockerImage("api", ["v2", "latest"])])
+        self.assertEqual({"api:v2": "tagged", "api:latest": "unchanged"}, result)
+        self.assert_built()
+        # Nothing is pushed
+        self.assertEqual(1, self.execute_parallel.call_count)
+        self.stubber.assert_no_pending_responses()
+
+    def test_up_to_date(self):
+        self.expect_remote_images(["v2", "latest"], [remote_image("v2", "sha256:image", "sha256:config"),
+                                                     remote_image("latest", "sha256:image", "sha256:config")])
+
+        result = self.ecr.build_and_push_images([DockerImage("api", ["v2", "latest"])])
+        self.assertEqual({"api:v2": "unchanged", "api:latest": "unchanged"}, result)
+        self.assert_built()
+        self.assertEqual(1, self.execute_parallel.call_count)
+        self.stubber.assert_no_pending_responses()
+
+    def test_new_image(self):
+        self.expect_remote_images(["v2", "latest"], [remote_image("latest", "sha256:old", "sha256:old-config")])
+        self.expect_remote_images(["v2"], [remote_image("v2", "sha256:image", "sha256:config")])
+        self.expect_put_image("latest")
+
+        result = self.ecr.build_and_push_images([DockerImage("api", ["v2", "latest"])])
+        self.assertEqual({"api:v2": "pushed", "api:latest": "tagged"}, result)
+        self.assert_built()
+        # Only the first tag is pushed
+        self.assertEqual(call({"api:v2": ["docker", "push", f"{HOSTNAME}/api:v2"]}, max_parallel=4),
+                         self.execute_parallel.call_args_list[1])
+        self.assertEqual(2, self.execute_parallel.call_count)
+        self.stubber.assert_no_pending_responses()
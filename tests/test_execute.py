@@ -0,0 +1,142 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from infrastructure_builder.exceptions import BuilderError
+from infrastructure_builder.execute import (execute_async, execute_live_async, execute_parallel,
+                                            execute_streaming)
+
+
+class TestExecuteStreaming(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.output_file = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.output_file)
+
+    def test_binary_output(self):
+        script = "import sys; sys.stdout.buffer.write(bytes(range(256)) * 1000)"
+        execute_streaming([sys.executable, "-c", script], self.output_file)
+        with open(self.output_file, "rb") as f:
+            self.assertEqual(bytes(range(256)) * 1000, f.read())
+
+    def test_input(self):
+        script = "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read()[::-1])"
+        execute_streaming([sys.executable, "-c", script], self.output_file, inp="abc" * 100000)
+        with open(self.output_file, "rb") as f:
+            self.assertEqual(b"cba" * 100000, f.read())
+
+    def test_stderr_tail(self):
+        script = "import sys; sys.stderr.write('x' * 100000 + 'END'); sys.exit(3)"
+        with self.assertLogs("infrastructure_builder.execute", level="ERROR") as logs:
+            with self.assertRaises(BuilderError):
+                execute_streaming([sys.executable, "-c", script], self.output_file, stderr_tail_size=10)
+        self.assertEqual(["ERROR:infrastructure_builder.execute:xxxxxxxEND"], logs.output)
+
+
+class TestExecuteParallel(unittest.TestCase):
+
+    def test_prefixed_output(self):
+        commands = {f"cmd{i}": [sys.executable, "-c", f"print('hello {i}')"] for i in range(3)}
+        with self.assertLogs("infrastructure_builder.execute", level="INFO") as logs:
+            execute_parallel(commands, max_parallel=2)
+        self.assertEqual(["INFO:infrastructure_builder.execute:[cmd0] hello 0",
+                          "INFO:infrastructure_builder.execute:[cmd1] hello 1",
+                          "INFO:infrastructure_builder.execute:[cmd2] hello 2"],
+                         sorted(logs.output))
+
+    def test_fail_fast(self):
+        commands = {
+            "fail": [sys.executable, "-c", "import sys; sys.exit(2)"],
+            "slow": [sys.executable, "-c", "import time; time.sleep(30)"],
+        }
+        with self.assertLogs("infrastructure_builder.execute", level="ERROR"):
+            with self.assertRaisesRegex(BuilderError, r"^Execution failed: fail \(2\)$"):
+                execute_parallel(commands, max_parallel=2)
+
+    def test_missing_executable(self):
+        commands = {
+            "missing": ["/nonexistent/command"],
+            "slow": [sys.executable, "-c", "import time; time.sleep(30)"],
+        }
+        start = time.monotonic()
+        with self.assertLogs("infrastructure_builder.execute", level="ERROR"):
+            with self.assertRaisesRegex(BuilderError, r"^Execution failed: missing \(No such file or directory\)$"):
+                execute_parallel(commands, max_parallel=2)
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_collect_failures(self):
+        commands = {
+            "fail1": [sys.executable, "-c", "import sys; sys.exit(2)"],
+            "ok": [sys.executable, "-c", "pass"],
+            "fail2": [sys.executable, "-c", "import sys; sys.exit(3)"],
+        }
+        with self.assertLogs("infrastructure_builder.execute", level="ERROR"):
+            with self.assertRaisesRegex(BuilderError, r"fail1 \(2\).*fail2 \(3\)|fail2 \(3\).*fail1 \(2\)"):
+                execute_parallel(commands, max_parallel=1, fail_fast=False)
+
+
+class TestExecuteAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_capture_output(self):
+        script = "import sys; print('out'); print('err', file=sys.stderr)"
+        result = await execute_async([sys.executable, "-c", script])
+        self.assertEqual(("out\n", "err\n"), (result.stdout, result.stderr))
+
+    async def test_stream_input(self):
+        async def chunks():
+            for _ in range(100):
+                yield b"x" * 10000
+
+        script = "import sys; print(len(sys.stdin.buffer.read()))"
+        result = await execute_async([sys.executable, "-c", script], inp=chunks())
+        self.assertEqual("1000000\n", result.stdout)
+
+    async def test_line_callback(self):
+        lines = []
+        script = "import sys; print('a'); print('b', file=sys.stderr, flush=True); print('c')"
+        await execute_live_async([sys.executable, "-u", "-c", script], on_line=lines.append)
+        self.assertEqual(["a", "b", "c"], lines)
+
+    async def test_timeout(self):
+        with self.assertRaisesRegex(BuilderError, "did not finish"):
+            await execute_live_async([sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.5)
+
+    async def test_idle_timeout(self):
+        script = "import time\nfor i in range(3): print(i, flush=True); time.sleep(0.1)\ntime.sleep(30)"
+        lines = []
+        with self.assertRaisesRegex(BuilderError, "did not write any output"):
+            await execute_live_async([sys.executable, "-c", script], on_line=lines.append, idle_timeout=1)
+        self.assertEqual(["0", "1", "2"], lines)
+
+    async def test_long_line(self):
+        script = "import sys; sys.stdout.write('x' * 2 * 1024 * 1024 + '\\nend\\n')"
+        lines = []
+        await execute_live_async([sys.executable, "-c", script], on_line=lines.append)
+        self.assertEqual(2 * 1024 * 1024, sum(len(line) for line in lines[:-1]))
+        self.assertEqual("end", lines[-1])
+
+    async def test_callback_error_terminates_command(self):
+        script = "import os, time; print(os.getpid(), flush=True); time.sleep(30)"
+
+        def on_line(line: str):
+            pids.append(int(line))
+            raise ValueError("Unexpected output")
+
+        pids = []
+        with self.assertRaisesRegex(ValueError, "Unexpected output"):
+            await asyncio.wait_for(execute_live_async([sys.executable, "-c", script], on_line=on_line), 10)
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pids[0], 0)
+
+    async def test_cancel(self):
+        task = asyncio.ensure_future(execute_async([sys.executable, "-c", "import time; time.sleep(30)"]))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
@@ -0,0 +1,38 @@
+import threading
+import unittest
+
+from infrastructure_builder.aws.cloudformation import CloudFormation
+from infrastructure_builder.aws.fan_out import Target, fan_out, get_session
+
+
+class TestFanOut(unittest.TestCase):
+
+    def test_helpers_use_target_session(self):
+        barrier = threading.Barrier(3)
+
+        def deploy(target: Target):
+            # All targets run at the same time
+            barrier.wait(5)
+            helper = CloudFormation()
+            return helper.session, helper.region
+
+        targets = [Target("eu-west-1"), Target("eu-central-1"), Target("us-east-1")]
+        results = fan_out(deploy, targets)
+        self.assertEqual([(get_session(target), target.region) for target in targets],
+                         [result.result for result in results])
+
+    def test_errors_per_target(self):
+        def deploy(target: Target):
+            if target.region == "us-east-1":
+                raise ValueError("Not supported")
+            return target.region
+
+        with self.assertLogs("infrastructure_builder.aws.fan_out", level="ERROR"):
+            results = fan_out(deploy, [Target("eu-west-1"), Target("us-east-1")])
+        self.assertEqual([True, False], [result.ok for result in results])
+        self.assertEqual("eu-west-1", results[0].result)
+        self.assertIsInstance(results[1].error, ValueError)
+
+    def test_clients_are_pooled(self):
+        session = get_session(Target("eu-west-1"))
+        self.assertIs(CloudFormation(session).client, CloudFormation(session).client)
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from infrastructure_builder.journal import RunJournal
+from infrastructure_builder.task_registry import TaskRegistry
+
+
+class ResumableRegistry(TaskRegistry):
+    tasks = {}
+
+
+executed = []
+fail_deploy = True
+
+
+@ResumableRegistry.task("build", description="Build")
+def build():
+    executed.append("build")
+    return {"image": "app:1.0"}
+
+
+@ResumableRegistry.task("deploy", description="Deploy")
+def deploy():
+    executed.append("deploy")
+    if fail_deploy:
+        raise RuntimeError("Deployment failed")
+    return ResumableRegistry.get_output("build")["image"]
+
+
+@ResumableRegistry.task("test", description="Test")
+def test():
+    executed.append("test")
+
+
+class TestRunJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "state", "journal.json")
+        executed.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_missing_journal(self):
+        self.assertIsNone(RunJournal.load(self.filename))
+
+    def test_unserializable_output(self):
+        journal = RunJournal(self.filename, ["build"])
+        journal.start(0)
+        with self.assertLogs("infrastructure_builder.journal", level="WARNING"):
+            journal.finish(0, object())
+        self.assertFalse(RunJournal.load(self.filename).is_finished(0))
+
+    def test_resume(self):
+        global fail_deploy
+        tasks = [ResumableRegistry.tasks[name] for name in ["build", "deploy", "test"]]
+
+        fail_deploy = True
+        with self.assertRaises(RuntimeError):
+            ResumableRegistry.execute_tasks(tasks, RunJournal(self.filename, [t.name for t in tasks]))
+        journal = RunJournal.load(self.filename)
+        self.assertEqual(["finished", "failed", "pending"], [entry["status"] for entry in journal.entries])
+        self.assertEqual("RuntimeError: Deployment failed", journal.entries[1]["error"])
+
+        fail_deploy = False
+        ResumableRegistry.outputs.clear()
+        ResumableRegistry.execute_tasks(tasks, journal, resume=True)
+        self.assertEqual(["build", "deploy", "deploy", "test"], executed)
+        self.assertEqual("app:1.0", ResumableRegistry.get_output("deploy"))
+        self.assertEqual(["finished", "finished", "finished"],
+                         [entry["status"] for entry in RunJournal.load(self.filename).entries])
@@ -0,0 +1,63 @@
+import unittest
+
+import boto3
+from botocore.stub import Stubber
+
+from infrastructure_builder.aws.logs import CloudWatchLogs
+
+GROUP = "/aws/batch/job"
+STREAM = "job/default/1"
+
+
+def log_events(*messages: str) -> list[dict]:
+    return [dict(timestamp=0, message=message, ingestionTime=0) for message in messages]
+
+
+class TestLogStreamTailer(unittest.TestCase):
+
+    def setUp(self):
+        session = boto3.Session(region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test")
+        self.logs = CloudWatchLogs(session)
+        self.stubber = Stubber(self.logs.client)
+        self.stubber.activate()
+        self.tailer = self.logs.tail(GROUP, STREAM)
+
+    def tearDown(self):
+        self.stubber.deactivate()
+
+    def expect(self, events: list[dict], next_token: str, token: str = None):
+        params = dict(logGroupName=GROUP, logStreamName=STREAM, startFromHead=True)
+        if token is not None:
+            params["nextToken"] = token
+        self.stubber.add_response("get_log_events", dict(events=events, nextForwardToken=next_token), params)
+
+    def test_forward_token(self):
+        self.expect(log_events("a", "b"), "f/1")
+        self.expect(log_events("c"), "f/2", "f/1")
+        # End of stream: the same token is returned again
+        self.expect([], "f/2", "f/2")
+        self.assertEqual(["a", "b", "c"], [event["message"] for event in self.tailer.poll()])
+
+        # The next poll continues with the last token
+        self.expect(log_events("d"), "f/3", "f/2")
+        self.expect([], "f/3", "f/3")
+        self.assertEqual(["d"], [event["message"] for event in self.tailer.poll()])
+        self.stubber.assert_no_pending_responses()
+
+    def test_missing_stream(self):
+        self.stubber.add_client_error("get_log_events", "ResourceNotFoundException")
+        self.assertEqual([], self.tailer.poll())
+
+        # The stream is read from the beginning once it exists
+        self.expect(log_events("a"), "f/1")
+        self.expect([], "f/1", "f/1")
+        self.assertEqual(["a"], [event["message"] for event in self.tailer.poll()])
+        self.stubber.assert_no_pending_responses()
+
+    def test_access_denied(self):
+        self.stubber.add_client_error("get_log_events", "AccessDeniedException")
+        with self.assertLogs("infrastructure_builder.aws.logs", level="WARNING"):
+            self.assertEqual([], self.tailer.poll())
+        # No more requests
+        self.assertEqual([], self.tailer.poll())
+        self.stubber.assert_no_pending_responses()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from infrastructure_builder.metrics import MetricsStore, TaskMetrics, format_report, is_regressed, percentile, \
+    task_metrics
+from infrastructure_builder.tracing import Tracer
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = MetricsStore(os.path.join(self.temp_dir.name, "metrics", "metrics.db"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_percentile(self):
+        self.assertEqual(3, percentile([5, 1, 3, 2, 4], 50))
+        self.assertEqual(10, percentile(list(range(1, 11)), 95))
+        self.assertEqual(7, percentile([7], 95))
+
+    def test_task_metrics(self):
+        tracer = Tracer()
+        tracer.add_span("deploy", "task", 0.0, 10.0)
+        tracer.add_span("cloudformation.CreateStack", "aws", 0.1, 0.2)
+        tracer.add_span("cloudformation.wait", "wait", 0.2, 9.0)
+        tracer.add_span("cloudformation.DescribeStacks", "aws", 5.0, 5.1)
+        tracer.add_span("test", "task", 11.0, 12.0, error="ValueError")
+        self.assertEqual([TaskMetrics("deploy", 10.0, 2, 8.8), TaskMetrics("test", 1.0, 0, 0.0, True)],
+                         [TaskMetrics(m.task, round(m.duration, 6), m.api_calls, round(m.wait_time, 6), m.failed)
+                          for m in task_metrics(tracer)])
+
+    def test_report(self):
+        self.assertEqual([], self.store.report())
+        for duration in [10, 11, 9, 10, 25]:
+            self.store.record([TaskMetrics("deploy", duration, 5, 1.0), TaskMetrics("build", 2, 0, 0.0)])
+        self.store.record([TaskMetrics("build", 60, 0, 0.0, failed=True)])
+
+        build, deploy = self.store.report()
+        self.assertEqual(("build", 5, 2, 2), (build.task, build.runs, build.p50_duration, build.p95_duration))
+        self.assertFalse(is_regressed(build))
+        self.assertEqual(("deploy", 5, 25, 10, 25, 10),
+                         (deploy.task, deploy.runs, deploy.last_duration, deploy.p50_duration, deploy.p95_duration,
+                          deploy.baseline_duration))
+        self.assertTrue(is_regressed(deploy))
+        self.assertIn("REGRESSED (2.5x)", format_report([build, deploy]).splitlines()[2])
+
+        # Only recent runs are taken into account
+        deploy = self.store.report(recent_runs=2)[1]
+        self.assertEqual((2, None), (deploy.runs, deploy.ratio))
@@ -0,0 +1,59 @@
+import unittest
+
+from infrastructure_builder.aws.rate_limiter import AdaptiveRateLimiter
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = AdaptiveRateLimiter(clock=self.clock, sleep=self.clock.sleep)
+
+    def send(self, requests: int, interval: float = 0.0) -> None:
+        for _ in range(requests):
+            self.limiter.acquire()
+            self.clock.now += interval
+
+    def test_unlimited_until_throttled(self):
+        self.send(100)
+        self.assertEqual(100.0, self.clock.now)
+        self.assertEqual(0.0, self.limiter.rate)
+
+    def test_decrease_on_throttle(self):
+        self.send(20, 0.05)
+        self.limiter.on_throttle()
+        self.assertAlmostEqual(14.0, self.limiter.rate)
+
+        start = self.clock.now
+        self.send(28)
+        self.assertAlmostEqual(2.0, self.clock.now - start, delta=0.1)
+
+        self.limiter.on_throttle()
+        self.assertAlmostEqual(9.8, self.limiter.rate)
+
+    def test_minimum_rate(self):
+        self.limiter.on_throttle()
+        self.assertEqual(0.5, self.limiter.rate)
+
+    def test_increase_on_success(self):
+        self.send(10, 0.1)
+        self.limiter.on_throttle()
+        self.assertAlmostEqual(7.0, self.limiter.rate)
+        start = self.clock.now
+        for _ in range(20):
+            self.send(1)
+            self.clock.now += 0.1
+            self.limiter.on_success()
+        self.assertAlmostEqual(7.0 + 0.5 * (self.clock.now - start), self.limiter.rate)
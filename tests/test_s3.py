@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import boto3
+from botocore.stub import Stubber
+
+from infrastructure_builder.aws.s3 import SimpleStorageService
+
+
+class TestSyncDirectory(unittest.TestCase):
+
+    def setUp(self):
+        session = boto3.Session(region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test")
+        self.s3 = SimpleStorageService(session)
+        self.stubber = Stubber(self.s3.client)
+        self.stubber.activate()
+        # Files are uploaded in any order
+        self.uploads = {}
+        self.s3.client.meta.events.register("before-parameter-build.s3.PutObject", self.record_upload)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, "site")
+        self.manifest_file = os.path.join(self.temp_dir.name, "manifest.json")
+        os.makedirs(os.path.join(self.directory, "css"))
+        self.write("index.html", "<html></html>")
+        self.write("css/site.css", "body {}")
+
+    def tearDown(self):
+        self.s3.client.meta.events.unregister("before-parameter-build.s3.PutObject", self.record_upload)
+        self.stubber.deactivate()
+        self.temp_dir.cleanup()
+
+    def write(self, name: str, content: str):
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(content)
+
+    def record_upload(self, params, **kwargs):
+        self.uploads[params["Key"]] = params.get("ContentType")
+
+    def expect_uploads(self, count: int):
+        for _ in range(count):
+            self.stubber.add_response("put_object", {})
+
+    def sync(self, **kwargs) -> dict[str, str]:
+        return self.s3.sync_directory(self.directory, "bucket", "site/", manifest_file=self.manifest_file,
+                                      max_concurrency=1, **kwargs)
+
+    def test_uploads_changed_files_only(self):
+        self.expect_uploads(2)
+        self.assertEqual({"site/css/site.css": "uploaded", "site/index.html": "uploaded"}, self.sync())
+        self.assertEqual({"site/css/site.css": "text/css", "site/index.html": "text/html"}, self.uploads)
+
+        self.write("index.html", "<html><body></body></html>")
+        self.uploads.clear()
+        self.expect_uploads(1)
+        self.assertEqual({"site/css/site.css": "unchanged", "site/index.html": "uploaded"}, self.sync())
+        self.assertEqual({"site/index.html": "text/html"}, self.uploads)
+        self.assertEqual({"site/css/site.css": "unchanged", "site/index.html": "unchanged"}, self.sync())
+        self.stubber.assert_no_pending_responses()
+
+    def test_deletes_stale_keys(self):
+        self.expect_uploads(2)
+        self.sync()
+
+        os.remove(os.path.join(self.directory, "css/site.css"))
+        self.stubber.add_response("list_objects_v2", dict(Contents=[
+            dict(Key="site/css/site.css"), dict(Key="site/index.html"), dict(Key="site/old.html")
+        ]), dict(Bucket="bucket", Prefix="site/"))
+        self.stubber.add_response("delete_objects", {}, dict(Bucket="bucket", Delete={
+            "Objects": [{"Key": "site/css/site.css"}, {"Key": "site/old.html"}], "Quiet": True
+        }))
+        self.assertEqual({"site/index.html": "unchanged", "site/css/site.css": "deleted", "site/old.html": "deleted"},
+                         self.sync(delete=True))
+        self.stubber.assert_no_pending_responses()
@@ -0,0 +1,145 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import boto3
+from botocore.stub import Stubber
+
+from infrastructure_builder.aws.stepfunctions import ExecutionHistoryTailer, StepFunctions
+
+STATE_MACHINE_ARN = "arn:aws:states:eu-west-1:123456789012:stateMachine:sm"
+EXECUTION_ARN = "arn:aws:states:eu-west-1:123456789012:execution:sm:run"
+START = datetime(2024, 1, 1)
+
+
+def event(event_id: int) -> dict:
+    return dict(id=event_id, timestamp=datetime(2024, 1, 1), type="PassStateEntered")
+
+
+class TestExecutionHistoryTailer(unittest.TestCase):
+
+    def setUp(self):
+        self.client = boto3.Session(region_name="eu-west-1", aws_access_key_id="test",
+                                    aws_secret_access_key="test").client("stepfunctions")
+        self.stubber = Stubber(self.client)
+        self.stubber.activate()
+
+    def tearDown(self):
+        self.stubber.deactivate()
+
+    def test_polls_only_last_page(self):
+        tailer = ExecutionHistoryTailer(self.client, EXECUTION_ARN)
+        self.stubber.add_response("get_execution_history", dict(events=[event(1), event(2)], nextToken="page2"),
+                                  dict(executionArn=EXECUTION_ARN, maxResults=1000))
+        self.stubber.add_response("get_execution_history", dict(events=[event(3)]),
+                                  dict(executionArn=EXECUTION_ARN, maxResults=1000, nextToken="page2"))
+        self.assertEqual([1, 2, 3], [e["id"] for e in tailer.poll()])
+
+        # The last page is read again, known events are skipped
+        self.stubber.add_response("get_execution_history", dict(events=[event(3), event(4)]),
+                                  dict(executionArn=EXECUTION_ARN, maxResults=1000, nextToken="page2"))
+        self.assertEqual([4], [e["id"] for e in tailer.poll()])
+        self.stubber.assert_no_pending_responses()
+
+    def test_restarts_on_invalid_token(self):
+        tailer = ExecutionHistoryTailer(self.client, EXECUTION_ARN)
+        self.stubber.add_response("get_execution_history", dict(events=[event(1)], nextToken="page2"))
+        self.stubber.add_response("get_execution_history", dict(events=[]))
+        tailer.poll()
+
+        self.stubber.add_client_error("get_execution_history", "InvalidToken")
+        self.stubber.add_response("get_execution_history", dict(events=[event(1), event(2)]),
+                                  dict(executionArn=EXECUTION_ARN, maxResults=1000))
+        self.assertEqual([2], [e["id"] for e in tailer.poll()])
+
+
+def description(execution_arn: str, status: str, **details) -> dict:
+    return dict(executionArn=execution_arn, stateMachineArn=STATE_MACHINE_ARN, status=status, startDate=START,
+                **details)
+
+
+def state_event(event_id: int, event_type: str, name: str, seconds: float) -> dict:
+    details_key = "stateEnteredEventDetails" if event_type.endswith("Entered") else "stateExitedEventDetails"
+    return {"id": event_id, "timestamp": START + timedelta(seconds=seconds), "type": event_type,
+            details_key: dict(name=name)}
+
+
+class TestStepFunctions(unittest.TestCase):
+
+    def setUp(self):
+        session = boto3.Session(region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test")
+        self.stepfunctions = StepFunctions(session)
+        self.stubber = Stubber(self.stepfunctions.client)
+        self.stubber.activate()
+        self.sleep = patch("infrastructure_builder.aws.stepfunctions.sleep").start()
+
+    def tearDown(self):
+        patch.stopall()
+        self.stubber.deactivate()
+
+    def expect_execution(self, execution_arn: str, status: str, events: list[dict], **details):
+        self.stubber.add_response("describe_execution", description(execution_arn, status, **details),
+                                  dict(executionArn=execution_arn))
+        self.stubber.add_response("get_execution_history", dict(events=events),
+                                  dict(executionArn=execution_arn, maxResults=1000))
+
+    def test_wait_for_executions(self):
+        other_arn = f"{EXECUTION_ARN}2"
+        self.expect_execution(EXECUTION_ARN, "RUNNING", [
+            dict(id=1, timestamp=START, type="ExecutionStarted"),
+            state_event(2, "TaskStateEntered", "Build", 0),
+        ])
+        self.expect_execution(other_arn, "RUNNING", [])
+        self.expect_execution(EXECUTION_ARN, "SUCCEEDED", [
+            state_event(3, "TaskStateExited", "Build", 12.5),
+            dict(id=4, timestamp=START, type="ExecutionSucceeded"),
+        ])
+        self.expect_execution(other_arn, "FAILED", [dict(
+            id=1, timestamp=START, type="ExecutionFailed",
+            executionFailedEventDetails=dict(error="States.TaskFailed", cause="Build failed")
+        )], error="States.TaskFailed", cause="Build failed")
+
+        with self.assertLogs("infrastructure_builder.aws.stepfunctions") as logs:
+            descriptions = self.stepfunctions.wait_for_executions([EXECUTION_ARN, other_arn])
+
+        self.assertEqual(["SUCCEEDED", "FAILED"], [d["status"] for d in descriptions])
+        self.assertEqual(["[run] State Build entered", "[run] Status: RUNNING", "[run2] Status: RUNNING",
+                          "[run] State Build exited after 12.5s", "[run] Status: SUCCEEDED",
+                          "[run2] ExecutionFailed: States.TaskFailed Build failed", "[run2] Status: FAILED",
+                          "[run2] Error: States.TaskFailed", "[run2] Cause: Build failed"],
+                         [record.getMessage() for record in logs.records])
+        self.assertEqual(1, self.sleep.call_count)
+        self.stubber.assert_no_pending_responses()
+
+    def test_execute(self):
+        self.stubber.add_response("start_execution", dict(executionArn=EXECUTION_ARN, startDate=START),
+                                  dict(stateMachineArn=STATE_MACHINE_ARN, input="{}"))
+        self.expect_execution(EXECUTION_ARN, "SUCCEEDED", [])
+
+        with self.assertLogs("infrastructure_builder.aws.stepfunctions") as logs:
+            self.assertEqual(EXECUTION_ARN, self.stepfunctions.execute(STATE_MACHINE_ARN, "{}"))
+        self.assertEqual(["State submitted, now waiting until completed.", "Status: SUCCEEDED",
+                          "Execution details in AWS console: https://eu-west-1.console.aws.amazon.com/states/home?"
+                          f"region=eu-west-1#/v2/executions/details/{EXECUTION_ARN}"],
+                         [record.getMessage() for record in logs.records])
+        self.stubber.assert_no_pending_responses()
+
+    def test_execute_without_waiting(self):
+        self.stubber.add_response("start_execution", dict(executionArn=EXECUTION_ARN, startDate=START),
+                                  dict(stateMachineArn=STATE_MACHINE_ARN))
+        self.assertEqual(EXECUTION_ARN, self.stepfunctions.execute(STATE_MACHINE_ARN, wait_until_completed=False))
+        self.stubber.assert_no_pending_responses()
+
+    def test_execute_express(self):
+        self.stubber.add_response("start_sync_execution", dict(
+            executionArn=EXECUTION_ARN, startDate=START, stopDate=START, status="FAILED", error="States.Timeout",
+            cause="Timed out"
+        ), dict(stateMachineArn=STATE_MACHINE_ARN, input="{}"))
+
+        with self.assertLogs("infrastructure_builder.aws.stepfunctions") as logs:
+            self.assertEqual(EXECUTION_ARN, self.stepfunctions.execute(STATE_MACHINE_ARN, "{}", express=True))
+        self.assertEqual(["Express state machine started, now waiting until completed.", "Status: FAILED",
+                          "Error: States.Timeout", "Cause: Timed out"],
+                         [record.getMessage() for record in logs.records])
+        self.sleep.assert_not_called()
+        self.stubber.assert_no_pending_responses()
@@ -1,5 +1,15 @@
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from unittest.mock import patch
 
+from infrastructure_builder import tracing
+from infrastructure_builder.exceptions import BuilderError
+from infrastructure_builder.metrics import MetricsStore
 from infrastructure_builder.task_registry import TaskRegistry
 
 
@@ -42,3 +52,158 @@ class TestTaskRegistry(unittest.TestCase):
 
     def test_call_task(self):
         TaskRegistry.get_task("sampleTask").execute()
+
+
+class DeploymentRegistry(TaskRegistry):
+    tasks = {}
+
+
+for service in ["api", "web"]:
+    for region in ["eu-west-1", "eu-central-1", "us-east-1"]:
+        DeploymentRegistry.task(f"{service}:{region}", description=f"Deploy {service} to {region}", namespace="deploy",
+                                tags=[service, "frontend" if service == "web" else "backend"])(lambda: None)
+
+
+class TestTaskSelection(unittest.TestCase):
+
+    def test_separate_registry(self):
+        self.assertIsNone(TaskRegistry.get_task("deploy:api:eu-west-1"))
+        self.assertIsNone(DeploymentRegistry.get_task("sampleTask"))
+
+    def test_shared_registry(self):
+        class SharedRegistry(TaskRegistry):
+            pass
+
+        self.assertIs(TaskRegistry.get_task("sampleTask"), SharedRegistry.get_task("sampleTask"))
+        self.assertEqual(["sampleTask"], [t.name for t in SharedRegistry.select_tasks("sampleTask")])
+
+    def test_namespace(self):
+        self.assertEqual("deploy:api:eu-west-1", DeploymentRegistry.get_task("deploy:api:eu-w").name)
+        self.assertEqual("deploy:web:us-east-1", DeploymentRegistry.get_task("DEPLOY:WEB:US").name)
+        self.assertIsNone(DeploymentRegistry.get_task("deploy:api:eu"))
+
+    def test_glob(self):
+        self.assertEqual(["deploy:api:eu-west-1", "deploy:api:eu-central-1", "deploy:web:eu-west-1",
+                          "deploy:web:eu-central-1"],
+                         [t.name for t in DeploymentRegistry.select_tasks("deploy:*:eu-*")])
+        self.assertEqual(["deploy:web:us-east-1"], [t.name for t in DeploymentRegistry.select_tasks("*:web:US-*")])
+        self.assertEqual([], DeploymentRegistry.select_tasks("deploy:db:*"))
+
+    def test_tag(self):
+        self.assertEqual(["deploy:web:eu-west-1", "deploy:web:eu-central-1", "deploy:web:us-east-1"],
+                         [t.name for t in DeploymentRegistry.select_tasks("@frontend")])
+        self.assertEqual([], DeploymentRegistry.select_tasks("@database"))
+
+    def test_name(self):
+        self.assertEqual(["deploy:api:us-east-1"], [t.name for t in DeploymentRegistry.select_tasks("deploy:api:us")])
+        self.assertEqual([], DeploymentRegistry.select_tasks("deploy:api"))
+
+
+class CpuRegistry(TaskRegistry):
+    tasks = {}
+    cpu_workers = 2
+
+
+@CpuRegistry.task("prepare", description="Prepare")
+def prepare():
+    return 21
+
+
+for number in range(2):
+    @CpuRegistry.task(f"render{number}", description="Render templates", cpu_bound=True)
+    def render(number=number):
+        logging.getLogger("tests.render").info(f"Rendering {number}")
+        return os.getpid(), CpuRegistry.get_output("prepare") * 2 + number
+
+
+@CpuRegistry.task("package", description="Package rendered templates", cpu_bound=True,
+                   depends_on=["render0", "render1"])
+def package():
+    return CpuRegistry.get_output("render0")[1] + CpuRegistry.get_output("render1")[1]
+
+
+@CpuRegistry.task("packageWithoutDependencies", description="Package rendered templates", cpu_bound=True)
+def package_without_dependencies():
+    return CpuRegistry.get_output("render0")
+
+
+for number in range(2):
+    @CpuRegistry.task(f"sleep{number}", description="Sleep", cpu_bound=True)
+    def sleep():
+        start = time.time()
+        time.sleep(1)
+        return start, time.time()
+
+
+@CpuRegistry.task("fail", description="Fail", cpu_bound=True)
+def fail():
+    raise ValueError("Rendering failed")
+
+
+class TestCpuBoundTasks(unittest.TestCase):
+
+    def test_execute_in_worker_process(self):
+        tasks = [CpuRegistry.get_task(name) for name in ["prepare", "render0", "render1"]]
+        with self.assertLogs("tests.render") as logs:
+            CpuRegistry.execute_tasks(tasks)
+        pid, result = CpuRegistry.get_output("render0")
+        self.assertNotEqual(os.getpid(), pid)
+        self.assertEqual(42, result)
+        self.assertEqual(43, CpuRegistry.get_output("render1")[1])
+        self.assertEqual(["Rendering 0", "Rendering 1"], sorted(record.getMessage() for record in logs.records))
+
+    def test_concurrent(self):
+        CpuRegistry.execute_tasks([CpuRegistry.get_task("sleep0"), CpuRegistry.get_task("sleep1")])
+        (start0, end0), (start1, end1) = CpuRegistry.get_output("sleep0"), CpuRegistry.get_output("sleep1")
+        self.assertLess(max(start0, start1), min(end0, end1))
+
+    def test_depends_on_cpu_bound_task(self):
+        tasks = [CpuRegistry.get_task(name) for name in ["prepare", "render0", "render1", "package"]]
+        CpuRegistry.execute_tasks(tasks)
+        self.assertEqual(85, CpuRegistry.get_output("package"))
+
+    def test_output_of_concurrent_task(self):
+        tasks = [CpuRegistry.get_task(name) for name in ["prepare", "render0", "packageWithoutDependencies"]]
+        with self.assertRaisesRegex(BuilderError, "Output of task render0 is not available"):
+            CpuRegistry.execute_tasks(tasks)
+
+    def test_process_pool_imported_on_demand(self):
+        script = "import sys, infrastructure_builder.task_registry; print('multiprocessing' in sys.modules)"
+        self.assertEqual("False", subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                                 check=True).stdout.strip())
+
+    def test_failure(self):
+        with self.assertRaisesRegex(ValueError, "Rendering failed"):
+            CpuRegistry.execute_tasks([CpuRegistry.get_task("fail")])
+
+
+class WatchRegistry(TaskRegistry):
+    tasks = {}
+
+
+@WatchRegistry.task("render", description="Render templates", inputs=["templates"])
+def render_templates():
+    ...
+
+
+class TestWatchTasks(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = MetricsStore(os.path.join(self.temp_dir.name, "metrics.db"))
+        self.tracer = tracing.Tracer()
+        tracing.set_tracer(self.tracer)
+
+    def tearDown(self):
+        tracing.set_tracer(None)
+        self.temp_dir.cleanup()
+
+    def test_record_metrics_of_each_execution(self):
+        with patch("infrastructure_builder.task_registry.FileWatcher") as watcher:
+            watcher.return_value.__enter__.return_value.wait_for_changes.side_effect = [
+                {os.path.abspath(os.path.join("templates", "index.html"))}, KeyboardInterrupt()
+            ]
+            WatchRegistry.watch_tasks([WatchRegistry.get_task("render")], metrics=self.store)
+
+        self.assertEqual(2, self.store.report()[0].runs)
+        self.assertEqual([], self.tracer.get_spans())
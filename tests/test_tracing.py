@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+
+import boto3
+from botocore.stub import Stubber
+
+from infrastructure_builder import tracing
+from infrastructure_builder.aws.cloudformation import CloudFormation
+from infrastructure_builder.tracing import Tracer
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_span(self):
+        tracer = Tracer()
+        with tracer.span("deploy", "task") as args:
+            args["stack"] = "network"
+        with self.assertRaises(ValueError):
+            with tracer.span("deploy", "task"):
+                raise ValueError()
+
+        self.assertEqual(2, len(tracer.spans))
+        self.assertEqual({"stack": "network"}, tracer.spans[0].args)
+        self.assertEqual({"error": "ValueError"}, tracer.spans[1].args)
+
+    def test_max_spans(self):
+        tracer = Tracer(max_spans=2)
+        for name in ["first", "second", "third"]:
+            with tracer.span(name, "task"):
+                pass
+        self.assertEqual(["second", "third"], [span.name for span in tracer.get_spans()])
+        tracer.clear()
+        self.assertEqual([], tracer.get_spans())
+
+    def test_module_span(self):
+        tracer = Tracer()
+        with tracing.span("ignored", "task"):
+            pass
+        tracing.set_tracer(tracer)
+        try:
+            with tracing.span("recorded", "task"):
+                pass
+        finally:
+            tracing.set_tracer(None)
+        self.assertEqual(["recorded"], [span.name for span in tracer.spans])
+
+    def test_chrome_trace(self):
+        tracer = Tracer()
+        tracer.add_span("cloudformation.DescribeStacks", "aws", 1.0, 1.5, retries=1, throttles=1)
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            tracer.write_chrome_trace(filename)
+            with open(filename) as f:
+                trace = json.load(f)
+        finally:
+            os.remove(filename)
+        event = trace["traceEvents"][0]
+        self.assertEqual(("cloudformation.DescribeStacks", "aws", "X", 500000),
+                         (event["name"], event["cat"], event["ph"], event["dur"]))
+        self.assertEqual({"retries": 1, "throttles": 1}, event["args"])
+
+    def test_summary(self):
+        tracer = Tracer()
+        tracer.add_span("cloudformation.DescribeStacks", "aws", 1.0, 1.5, retries=1, throttles=1)
+        tracer.add_span("cloudformation.DescribeStacks", "aws", 2.0, 3.0, retries=0, throttles=0)
+        tracer.add_span("deploy", "task", 0.0, 4.0)
+        self.assertEqual("Category  Name                           Count  Total [s]  Max [s]  Retries  Throttles\n"
+                         "task      deploy                             1      4.000    4.000        0          0\n"
+                         "aws       cloudformation.DescribeStacks      2      1.500    1.000        1          1",
+                         tracer.format_summary())
+
+    def test_pooled_client_with_several_tracers(self):
+        session = boto3.Session(region_name="eu-west-1", aws_access_key_id="test", aws_secret_access_key="test")
+        client = CloudFormation(session).client
+        tracers = [Tracer(), Tracer()]
+        with Stubber(client) as stubber:
+            try:
+                for tracer in tracers + [None]:
+                    tracing.set_tracer(tracer)
+                    # Same client from the pool
+                    self.assertIs(client, CloudFormation(session).client)
+                    stubber.add_response("describe_stacks", dict(Stacks=[]))
+                    client.describe_stacks()
+            finally:
+                tracing.set_tracer(None)
+        self.assertEqual([["cloudformation.DescribeStacks"]] * 2,
+                         [[span.name for span in tracer.spans] for tracer in tracers])
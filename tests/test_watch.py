@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from infrastructure_builder.watch import FileWatcher, is_affected
+
+
+class FileWatcherTests:
+    use_inotify: bool
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.temp_dir.name
+        os.makedirs(os.path.join(self.directory, "src", "lib"))
+        self.template = self.write("template.yaml", "Resources: {}")
+        self.source = self.write("src/lib/handler.py", "pass")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name: str, content: str) -> str:
+        filename = os.path.join(self.directory, name)
+        with open(filename, "w") as f:
+            f.write(content)
+        return filename
+
+    def watcher(self) -> FileWatcher:
+        watcher = FileWatcher([self.template, os.path.join(self.directory, "src")], debounce=0.1,
+                              poll_interval=0.05, use_inotify=self.use_inotify)
+        self.assertEqual(self.use_inotify, watcher.uses_inotify)
+        return watcher
+
+    def test_no_changes(self):
+        with self.watcher() as watcher:
+            self.write("unrelated.txt", "")
+            self.assertEqual(set(), watcher.wait_for_changes(timeout=0.3))
+
+    def test_changes_are_debounced(self):
+        def change_files():
+            for i in range(3):
+                self.write("template.yaml", f"Resources: {{}} # {i}")
+                self.write("src/lib/new.py", f"# {i}")
+                time.sleep(0.02)
+
+        with self.watcher() as watcher:
+            thread = threading.Thread(target=change_files)
+            thread.start()
+            changes = watcher.wait_for_changes(timeout=5)
+            thread.join()
+            self.assertEqual({self.template, os.path.join(self.directory, "src", "lib", "new.py")}, changes)
+            self.assertEqual(set(), watcher.wait_for_changes(timeout=0.3))
+
+    def test_deleted_file(self):
+        with self.watcher() as watcher:
+            os.remove(self.source)
+            self.assertEqual({self.source}, watcher.wait_for_changes(timeout=5))
+
+
+class TestPollingFileWatcher(FileWatcherTests, unittest.TestCase):
+    use_inotify = False
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is available on Linux only")
+class TestInotifyFileWatcher(FileWatcherTests, unittest.TestCase):
+    use_inotify = True
+
+
+class TestIsAffected(unittest.TestCase):
+
+    def test_is_affected(self):
+        src = os.path.abspath("src")
+        self.assertTrue(is_affected(os.path.join(src, "lib", "handler.py"), ["src"]))
+        self.assertTrue(is_affected(src, [src]))
+        self.assertFalse(is_affected(os.path.abspath("src2"), ["src"]))